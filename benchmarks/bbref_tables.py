@@ -0,0 +1,160 @@
+import re
+import sys
+import timeit
+
+from benchmarks.fixtures import boxscore_response
+from game_crawlers.nba.bbref_crawler import BBRefSpider, BoxscoreContext
+from game_crawlers.nba.fields import Player, PlayerStats
+from game_crawlers.nba.tables import stat_footer
+
+# Compares the lxml data-stat extractor used by BBRefSpider against the regex parser it
+# replaced, on the player and team box score tables of one boxscore. RegexParser is the
+# previous implementation, kept here only as the baseline.
+#
+#   python -m benchmarks.bbref_tables [saved_boxscore.html]
+
+RE_PLAYER_INFO = r'data-append-csv="(?P<id>[a-z0-9]+)".+csk="(?P<name>.+)"><a'
+RE_MP = r"data-stat=\"mp\".+>(?P<val>[0-9]{2}:[0-9]{2})</td>"
+RE_BASIC = r"data-stat=\"(?P<stat>[a-z0-9_]+)\">(?P<val>[0-9.:+-]+)</td>"
+RE_ADVANCED = r"data-stat=\"(?P<stat>[a-z0-9_]+)\">(?P<val>[0-9.:+]+)</td>"
+RE_BPM = r"data-stat=\"bpm\".+OBPM: (?P<obpm>[0-9.-]+)&.+DBPM: (?P<dbpm>[0-9-.]+)&.+VORP: (?P<vorp>[0-9-.]+)&.+>(?P<bpm>[0-9-.]+)</td>"
+RE_TEAM = r"data-stat=\"(?P<stat>[A-Za-z0-9_]+)\">(?P<val>[0-9.]+)<"
+
+BASIC_MAP = {
+    "fg": "fgm",
+    "fga": "fga",
+    "fg_pct": "fg_per",
+    "fg3": "x3pm",
+    "fg3a": "x3pa",
+    "fg3_pct": "x3p_per",
+    "ft": "ftm",
+    "fta": "fta",
+    "ft_pct": "ft_per",
+    "orb": "orebs",
+    "drb": "drebs",
+    "trb": "rebounds",
+    "ast": "assists",
+    "stl": "steals",
+    "blk": "blocks",
+    "tov": "turnovers",
+    "pf": "fouls",
+    "pts": "points",
+    "plus_minus": "plus_minus",
+}
+ADVANCED_MAP = {
+    "ts_pct": "ts_per",
+    "efg_pct": "efg_per",
+    "fg3a_per_fga_pct": "x3p_ar",
+    "fta_per_fga_pct": "ft_ar",
+    "orb_pct": "oreb_per",
+    "drb_pct": "dreb_per",
+    "trb_pct": "reb_per",
+    "ast_pct": "ast_per",
+    "stl_pct": "stl_per",
+    "blk_pct": "blk_per",
+    "tov_pct": "tov_per",
+    "usg_pct": "usg_per",
+    "off_rtg": "off_rating",
+    "def_rtg": "def_rating",
+    "bpm": "bpm",
+    "obpm": "obpm",
+    "dbpm": "dbpm",
+    "vorp": "vorp",
+}
+
+
+class RegexParser:
+    def parse_player_stats(self, response, team_abbr: str):
+        rows = '//table[@id="box-{}-game-{}"]//tbody/tr[not(@class="thead")]'
+        basic = self.parse_basic_player(response.xpath(rows.format(team_abbr, "basic")).getall())
+        advanced = self.parse_advanced_player(
+            response.xpath(rows.format(team_abbr, "advanced")).getall()
+        )
+        return [dict(PlayerStats(**basic[p], **advanced[p])) for p in basic.keys()]
+
+    def parse_basic_player(self, stat_list):
+        player_stats = dict()
+        for line in stat_list:
+            split_header = line.split("</th>")
+            player_info = re.search(RE_PLAYER_INFO, split_header[0])
+            player_name = player_info.group("name").split(",")
+            player_obj = Player(
+                player_id=player_info.group("id"),
+                last_name=player_name[0],
+                first_name=player_name[1],
+            )
+            s = re.search(RE_MP, split_header[1])
+            mp = s.group("val") if s is not None else "00:00"
+            stat_dict = {
+                "player": dict(player_obj),
+                "min": BBRefSpider.time_string_to_hours(mp),
+            }
+            for s in re.findall(RE_BASIC, split_header[1]):
+                if s[0] in BASIC_MAP.keys():
+                    stat_dict[BASIC_MAP[s[0]]] = s[1]
+            for _, v in BASIC_MAP.items():
+                if stat_dict.get(v, None) is None:
+                    stat_dict[v] = 0
+            player_stats[player_info.group("id")] = stat_dict
+        return player_stats
+
+    def parse_advanced_player(self, stat_list):
+        player_stats = dict()
+        for line in stat_list:
+            split_header = line.split("</th>")
+            player_info = re.search(RE_PLAYER_INFO, split_header[0])
+            stat_dict = dict()
+            for s in re.findall(RE_ADVANCED, split_header[1]):
+                if s[0] in ADVANCED_MAP.keys():
+                    stat_dict[ADVANCED_MAP[s[0]]] = s[1]
+            bpm_parse = re.search(RE_BPM, split_header[1])
+            if bpm_parse is not None:
+                for k in ("bpm", "obpm", "dbpm", "vorp"):
+                    stat_dict[k] = bpm_parse.group(k)
+            for _, v in ADVANCED_MAP.items():
+                if stat_dict.get(v, None) is None:
+                    stat_dict[v] = 0
+            player_stats[player_info.group("id")] = stat_dict
+        return player_stats
+
+    def parse_team_box(self, response, team_abbr: str, kind: str, stat_map: dict):
+        cells = response.xpath(f'//table[@id="box-{team_abbr}-game-{kind}"]//tfoot//td').getall()
+        stats = {}
+        for stat in cells:
+            match = re.search(RE_TEAM, stat)
+            if match and match.group("stat") in stat_map.keys():
+                stats[stat_map.get(match.group("stat"))] = match.group("val")
+        return stats
+
+
+def run_regex(parser, response):
+    for abbr in ("POR", "NJN"):
+        parser.parse_player_stats(response, abbr)
+        parser.parse_team_box(response, abbr, "basic", BASIC_MAP)
+        parser.parse_team_box(response, abbr, "advanced", ADVANCED_MAP)
+
+
+def run_lxml(spider, response):
+    context = BoxscoreContext(response)
+    for abbr in ("POR", "NJN"):
+        spider.parse_player_stats(context, abbr)
+        spider.parse_basic_team(stat_footer(context.table(f"box-{abbr}-game-basic")))
+        spider.parse_advanced_team(stat_footer(context.table(f"box-{abbr}-game-advanced")))
+
+
+def bench(name: str, fn, number: int = 200):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{name:<10} {seconds * 1000:8.3f} ms/boxscore")
+    return seconds
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    spider = BBRefSpider(urls=[])
+    response = boxscore_response(path=path)
+    # parse the document once up front so only the table extraction is timed
+    response.xpath("//table")
+
+    regex = bench("regex", lambda: run_regex(RegexParser(), response))
+    lxml = bench("lxml", lambda: run_lxml(spider, response))
+    print(f"speedup    {regex / lxml:8.2f}x")
@@ -0,0 +1,126 @@
+import argparse
+import os
+import time
+import timeit
+
+from benchmarks.fixtures import boxscore_response
+from db import nba
+from game_crawlers.nba.bbref_crawler import BBRefSpider
+
+# Compares the ways nbaDB can write parsed boxscores on a local postgres: ORM instances
+# added through the session's unit of work (how add_record used to write), Core executemany
+# inserts per game (add_record, the unbatched pipeline), batched multi-row upserts
+# (add_records) and the COPY bulk loader (copy_records). Every run starts from empty tables in
+# a scratch database, created with the nba schema if needed, so it never touches nba_stats.
+# --map-only just times mapping a game to rows, which needs no database.
+#
+#   createdb nba_bench
+#   dbName=... dbPass=... python -m benchmarks.db_load --games 2000 --batch-size 200
+
+TABLES = "games, team_stats, player_stats, players, teams"
+
+
+def records(games: int):
+    # parses synthetic boxscores with a distinct game id each, every overtime count is used
+    # so the line scores vary
+    spider = BBRefSpider(urls=[])
+    pages = [boxscore_response(seed=i, overtimes=i % 3) for i in range(10)]
+    return [
+        spider.parse_boxscore(pages[i % len(pages)], game_id=f"{i:09d}BEN")
+        for i in range(games)
+    ]
+
+
+def fresh_db(database: str) -> nba.nbaDB:
+    db = nba.nbaDB(os.environ["dbName"], os.environ["dbPass"], database=database)
+    nba.Base.metadata.create_all(db.engine)
+    db.session.execute(f"TRUNCATE {TABLES} CASCADE")
+    db.session.commit()
+    # the dimension cache is process wide, start each run without it
+    db.dimensions = nba.DimensionCache()
+    return db
+
+
+def orm_objects(db: nba.nbaDB, item: dict) -> nba.Game:
+    # a declarative instance per row, attached to the game through its relationships
+    rows = db._record_rows([item])
+    game = nba.Game(**rows["games"][0])
+    game.team_stats = [nba.TeamStat(**r) for r in rows["team_stats"]]
+    game.player_stats = [nba.PlayerStat(**r) for r in rows["player_stats"]]
+    return game
+
+
+def write_unit_of_work(db: nba.nbaDB, items: list, batch_size: int):
+    for item in items:
+        rows = db._record_rows([item])
+        for table in nba.DIMENSION_TABLES:
+            if rows[table]:
+                db._upsert(nba.Base.metadata.tables[table], rows[table])
+        db.session.add(orm_objects(db, item))
+        db.commit()
+
+
+def write_core(db: nba.nbaDB, items: list, batch_size: int):
+    for item in items:
+        db.add_record(item)
+        db.commit()
+
+
+def write_upsert(db: nba.nbaDB, items: list, batch_size: int):
+    for i in range(0, len(items), batch_size):
+        db.add_records(items[i : i + batch_size])
+
+
+def write_copy(db: nba.nbaDB, items: list, batch_size: int):
+    for i in range(0, len(items), batch_size):
+        db.copy_records(items[i : i + batch_size])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark nbaDB write paths")
+    parser.add_argument("--database", default=os.environ.get("BENCH_DB", "nba_bench"))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--map-only", action="store_true")
+    args = parser.parse_args()
+
+    items = records(args.games)
+    rows = sum(
+        1 + len(i["team_stats"]) + sum(len(p) for p in i["player_stats"].values())
+        for i in items
+    )
+    print(f"{args.games} games, {rows} game/stat rows")
+
+    # mapping cost per game, without a database
+    db = nba.nbaDB.__new__(nba.nbaDB)
+    db.dimensions = nba.DimensionCache()
+    db._pending_players, db._pending_teams = set(), set()
+    n = min(len(items), 200)
+    for name, fn in (
+        ("orm objects", lambda: [orm_objects(db, i) for i in items[:n]]),
+        ("row dicts", lambda: [db._record_rows([i]) for i in items[:n]]),
+    ):
+        seconds = min(timeit.repeat(fn, number=1, repeat=5)) / n
+        print(f"map to {name:<12} {seconds * 1000:8.3f} ms/game")
+    if args.map_only:
+        raise SystemExit(0)
+
+    results = dict()
+    for name, write in (
+        ("orm", write_unit_of_work),
+        ("core", write_core),
+        ("upsert", write_upsert),
+        ("copy", write_copy),
+    ):
+        db = fresh_db(args.database)
+        start = time.monotonic()
+        write(db, items, args.batch_size)
+        elapsed = time.monotonic() - start
+        count = db.session.execute("SELECT count(*) FROM player_stats").scalar()
+        db.close()
+        results[name] = elapsed
+        print(
+            f"{name:<8} {elapsed:8.2f}s {rows / elapsed:10.0f} rows/sec "
+            f"({count} player_stats rows)"
+        )
+    print(f"copy is {results['orm'] / results['copy']:.1f}x the orm path")
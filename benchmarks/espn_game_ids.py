@@ -0,0 +1,80 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import espn_scoreboard
+from game_crawlers.nba.espn_ids import ScoreboardFetcher, extract_game_ids, season_dates
+from game_crawlers.nba.game_id_store import GameIdStore
+
+# Game id discovery against a local fixture server that answers every scoreboard day after
+# --latency seconds, roughly what ESPN takes to serve the html. Times fetching one day after
+# the other, which is how GameDriver walks the calendar (before rendering anything in
+# Firefox), against ScoreboardFetcher with --workers concurrent requests, and the cost of
+# extracting the ids from a page.
+#
+#   python -m benchmarks.espn_game_ids --days 200 --workers 8
+
+
+def fixture_server(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = espn_scoreboard(self.path.rsplit("/", 1)[-1]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(name: str, fetcher: ScoreboardFetcher, dates) -> float:
+    t = time.monotonic()
+    results = fetcher.get_games_dates(dates)
+    seconds = time.monotonic() - t
+    games = sum(len(g) for g in results.values() if g)
+    print(f"{name:<24} {seconds:8.2f}s {len(dates) / seconds:8.1f} days/sec ({games} games)")
+    return seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark ESPN game id discovery")
+    parser.add_argument("--days", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.25)
+    args = parser.parse_args()
+
+    server = fixture_server(args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/nba/scoreboard/_/date/"
+    dates = list(season_dates(["05-06"]))[: args.days]
+    store = GameIdStore(os.path.join(tempfile.mkdtemp(), "game_ids.sqlite"))
+    # no rate limit, the point is the cost of the requests themselves
+    sequential = bench(
+        "  one day at a time", ScoreboardFetcher(url, 1, rate=1e6, store=store), dates
+    )
+    concurrent = bench(
+        f"  {args.workers} workers",
+        ScoreboardFetcher(url, args.workers, rate=1e6, store=store),
+        dates,
+    )
+    print(f"  speedup                {sequential / concurrent:8.2f}x")
+    server.shutdown()
+
+    page = espn_scoreboard("20060103")
+    links = espn_scoreboard("20060103", embed_json=False)
+    n = 2000
+    for name, html in (("embedded json", page), ("game links", links)):
+        t = time.perf_counter()
+        for _ in range(n):
+            extract_game_ids(html)
+        print(f"extract from {name:<14} {(time.perf_counter() - t) / n * 1e6:8.2f} us/page")
@@ -0,0 +1,181 @@
+import json
+import random
+
+# Builds synthetic basketball-reference boxscore pages with the same structure the spider
+# parses (scorebox, commented-out line score and four factors, basic and advanced box score
+# tables for both teams) so the benchmarks can run without network access or saved pages.
+
+BASIC_STATS = [
+    "fg",
+    "fga",
+    "fg_pct",
+    "fg3",
+    "fg3a",
+    "fg3_pct",
+    "ft",
+    "fta",
+    "ft_pct",
+    "orb",
+    "drb",
+    "trb",
+    "ast",
+    "stl",
+    "blk",
+    "tov",
+    "pf",
+    "pts",
+    "plus_minus",
+]
+ADVANCED_STATS = [
+    "ts_pct",
+    "efg_pct",
+    "fg3a_per_fga_pct",
+    "fta_per_fga_pct",
+    "orb_pct",
+    "drb_pct",
+    "trb_pct",
+    "ast_pct",
+    "stl_pct",
+    "blk_pct",
+    "tov_pct",
+    "usg_pct",
+    "off_rtg",
+    "def_rtg",
+]
+# shooting percentages are shown as .462, the rest of the percentages as 46.2
+RATE_STATS = {"fg_pct", "fg3_pct", "ft_pct", "ts_pct", "efg_pct", "fg3a_per_fga_pct", "fta_per_fga_pct"}
+
+BPM_CELL = (
+    '<td class="right poptip" data-stat="bpm" data-tip="OBPM: -3.7&lt;br&gt; DBPM: -2.4&lt;br&gt; '
+    "VORP: -3.2&lt;br&gt; &lt;em&gt;&lt;small&gt;VORP is prorated to 82 games&lt;/small&gt;"
+    '&lt;/em&gt; ">-6.1</td>'
+)
+
+
+def stat_value(stat: str, r: random.Random) -> str:
+    if stat in RATE_STATS:
+        return ("%.3f" % r.random()).lstrip("0")
+    if stat == "plus_minus":
+        return "%+d" % r.randint(-20, 20)
+    if "pct" in stat or "rtg" in stat:
+        return "%.1f" % (r.random() * 100)
+    return str(r.randint(0, 12))
+
+
+def box_table(abbr: str, kind: str, r: random.Random, players: int = 13) -> str:
+    stats = BASIC_STATS if kind == "basic" else ADVANCED_STATS
+    rows = list()
+    for i in range(players):
+        pid = f"{abbr.lower()}pl{i:02d}"
+        th = (
+            f'<th scope="row" class="left " data-append-csv="{pid}" data-stat="player" '
+            f'csk="Last{i},First{i}"><a href="/players/x/{pid}.html">First{i} Last{i}</a></th>'
+        )
+        if i == 5:
+            rows.append('<tr class="thead"><th>Reserves</th></tr>')
+        if i == players - 1:
+            rows.append(
+                f'<tr >{th}<td class="center iz" data-stat="reason" colspan="20">Did Not Play</td></tr>'
+            )
+            continue
+        cells = [
+            f'<td class="right " data-stat="mp" csk="2453">{r.randint(10, 40)}:{r.randint(10, 59)}</td>'
+        ]
+        cells += [f'<td class="right " data-stat="{s}">{stat_value(s, r)}</td>' for s in stats]
+        if kind == "advanced":
+            cells.append(BPM_CELL)
+        rows.append(f"<tr >{th}{''.join(cells)}</tr>")
+
+    totals = ['<td class="right " data-stat="mp">240</td>']
+    totals += [
+        f'<td class="right " data-stat="{s}">{stat_value(s, r)}</td>'
+        for s in stats
+        if s != "plus_minus"
+    ]
+    return (
+        f'<div class="table_wrapper"><table class="sortable stats_table" id="box-{abbr}-game-{kind}">'
+        f'<thead><tr><th>Starters</th></tr></thead><tbody>{"".join(rows)}</tbody>'
+        f'<tfoot><tr><th scope="row" class="left " data-stat="player">Team Totals</th>'
+        f'{"".join(totals)}</tr></tfoot></table></div>'
+    )
+
+
+def commented(div_id: str, inner: str) -> str:
+    return (
+        f'<div id="{div_id}" class="table_wrapper setup_commented commented">'
+        f'<div class="section_heading"></div><div class="placeholder"></div>\n<!--\n{inner}\n-->\n</div>'
+    )
+
+
+def boxscore(away: str = "POR", home: str = "NJN", seed: int = 0, overtimes: int = 0) -> str:
+    r = random.Random(seed)
+    four_factor_rows = "".join(
+        f'<tr ><th scope="row" class="left " data-stat="team_id" ><a href="/teams/{t}/2006.html">{t}</a></th>'
+        '<td class="right " data-stat="pace" >93.2</td><td class="right minus" data-stat="efg_pct" >.395</td>'
+        '<td class="right plus" data-stat="tov_pct" >13.8</td><td class="right minus" data-stat="orb_pct" >12.5</td>'
+        '<td class="right plus" data-stat="ft_rate" >.224</td><td class="right " data-stat="off_rtg" >82.6</td></tr>'
+        for t in (away, home)
+    )
+    periods = ["1", "2", "3", "4"] + [f"{i}OT" for i in range(1, overtimes + 1)]
+    line_score_rows = "".join(
+        f'<tr ><th scope="row" class="center " data-stat="team" ><a href="/teams/{t}/2006.html">{t}</a></th>'
+        + "".join(f'<td class="center " data-stat="{p}" >{r.randint(15, 35)}</td>' for p in periods)
+        + '<td class="center " data-stat="T" ><strong>101</strong></td></tr>'
+        for t in (away, home)
+    )
+    scorebox = (
+        '<div class="scorebox">'
+        f'<div><div><strong><a href="/teams/{away}/2006.html" itemprop="name">Portland Trail Blazers</a>'
+        '</strong></div><div class="scores"><div class="score">98</div></div><div>21-40</div></div>'
+        f'<div><div><strong><a href="/teams/{home}/2006.html" itemprop="name">New Jersey Nets</a>'
+        '</strong></div><div class="scores"><div class="score">101</div></div><div>30-31</div></div>'
+        '<div class="scorebox_meta"><div>7:30 PM, January 3, 2006</div><div>Continental Airlines Arena</div>'
+        "</div></div>"
+    )
+    body = scorebox
+    body += commented(
+        "all_line_score",
+        f'<div class="table_container" id="div_line_score"><table class="suppress_all stats_table" '
+        f'id="line_score"><tbody>{line_score_rows}</tbody></table></div>',
+    )
+    body += commented(
+        "all_four_factors",
+        f'<div class="table_container" id="div_four_factors"><table class="suppress_all stats_table" '
+        f'id="four_factors"><tbody>{four_factor_rows}</tbody></table></div>',
+    )
+    for t in (away, home):
+        body += box_table(t, "basic", r) + box_table(t, "advanced", r)
+    return f'<html><head><title>boxscore</title></head><body><div id="content">{body}</div></body></html>'
+
+
+def boxscore_response(seed: int = 0, overtimes: int = 0, path: str = None):
+    # returns an HtmlResponse for a synthetic page, or for a saved boxscore when a path is given
+    from scrapy.http import HtmlResponse
+
+    if path is not None:
+        with open(path, "rb") as f:
+            body = f.read()
+    else:
+        body = boxscore(seed=seed, overtimes=overtimes).encode()
+    return HtmlResponse(
+        url="https://www.basketball-reference.com/boxscores/200601030NJN.html",
+        body=body,
+        encoding="utf-8",
+    )
+
+
+def espn_scoreboard(day: str, games: int = 8, embed_json: bool = True) -> str:
+    # an ESPN scoreboard page for a day ("20060103"): the scoreboard json the page embeds
+    # plus a game link per game, or only the links with embed_json=False
+    ids = [f"26{day[2:]}{i:03d}" for i in range(games)]
+    links = "".join(
+        f'<section class="Scoreboard"><a class="AnchorLink" href="/nba/game/_/gameId/{g}">'
+        f"Gamecast</a></section>"
+        for g in ids
+    )
+    script = ""
+    if embed_json:
+        events = [{"id": g, "date": day, "status": {"state": "post"}} for g in ids]
+        page = {"page": {"content": {"scoreboard": {"evts": events}}}}
+        script = f"<script>window['__espnfitt__']={json.dumps(page)};</script>"
+    return f"<html><head></head><body>{links}{script}</body></html>"
@@ -0,0 +1,199 @@
+import re
+import timeit
+from typing import List
+
+from benchmarks.fixtures import boxscore_response
+from game_crawlers.nba.bbref_crawler import BBRefSpider, BoxscoreContext
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+from game_crawlers.nba.fields import Player, PlayerStats
+from game_crawlers.nba.tables import map_stats, stat_rows
+
+# Per-row cost of the player parsers with the stat schema from game_crawlers.nba.schema
+# (maps, defaults and compiled patterns built once at import) against rebuilding the maps
+# and running uncompiled patterns on every call, which is what the parsers did before. The
+# ESPN parser now reads each row's cells in one pass and converts the roster a column at a
+# time.
+#
+#   python -m benchmarks.stat_schema
+
+ESPN_ROW = (
+    '<tr><td class="name"><a href="https://www.espn.com/nba/player/_/id/3032977/'
+    'giannis-antetokounmpo">G. Antetokounmpo</a><span class="position">PF</span></td>'
+    '<td class="min">36</td><td class="fg">10-18</td><td class="3pt">1-4</td>'
+    '<td class="ft">7-9</td><td class="oreb">3</td><td class="dreb">9</td><td class="reb">12</td>'
+    '<td class="ast">6</td><td class="stl">1</td><td class="blk">2</td><td class="to">3</td>'
+    '<td class="pf">2</td><td class="plusminus">+8</td><td class="pts">28</td></tr>'
+)
+ESPN_ROWS = [ESPN_ROW] * 13
+
+
+def espn_rows_inline(game_id: int, boxscore: List[str]) -> List[dict]:
+    # the previous body of NBAESPNSpider.new_player_stats: a separate uncompiled pattern per
+    # stat, each resolved through re's pattern cache on every row
+    name_re = r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+).*position\">(?P<pos>[A-Z]{1,2})"
+
+    players = list()
+    fields = PlayerStats().fields
+    for line in boxscore:
+        # find name information on the table row
+        re_name = re.search(name_re, line)
+        if not re_name:
+            continue
+        player = Player(
+            player_id=re_name.group("pid"),
+            first_name=re_name.group("first"),
+            last_name=re_name.group("last"),
+            position=re_name.group("pos"),
+        )
+        p_stat_kwargs = {"player": dict(player), "game_id": game_id}
+
+        # check whether play was a DNP and then pull stats
+        try:
+            # define the regex statements for shooting statistics per line
+            ft_re = re.search(r"\"ft\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
+            x3p_re = re.search(r"\"3pt\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
+            fg_re = re.search(r"\"fg\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
+
+            # parse and calculate shooting fields
+
+            p_stat_kwargs["fta"] = int(ft_re.group("a"))
+            p_stat_kwargs["ftm"] = int(ft_re.group("m"))
+            if p_stat_kwargs["fta"] != 0:
+                p_stat_kwargs["ft_per"] = int(ft_re.group("m")) / int(
+                    ft_re.group("a")
+                )
+            else:
+                p_stat_kwargs["ft_per"] = 0
+
+            p_stat_kwargs["fga"] = int(fg_re.group("a"))
+            p_stat_kwargs["fgm"] = int(fg_re.group("m"))
+            if p_stat_kwargs["fga"] != 0:
+                p_stat_kwargs["fg_per"] = int(fg_re.group("m")) / int(
+                    fg_re.group("a")
+                )
+            else:
+                p_stat_kwargs["fg_per"] = 0
+
+            p_stat_kwargs["x3pa"] = int(x3p_re.group("a"))
+            p_stat_kwargs["x3pm"] = int(x3p_re.group("m"))
+            if p_stat_kwargs["x3pa"] != 0:
+                p_stat_kwargs["x3p_per"] = int(x3p_re.group("m")) / int(
+                    x3p_re.group("a")
+                )
+            else:
+                p_stat_kwargs["x3p_per"] = 0
+
+            # parse general statistic fields
+            p_stat_kwargs["min"] = re.search(
+                r"\"min\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["pts"] = re.search(
+                r"\"pts\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["oreb"] = re.search(
+                r"\"oreb\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["dreb"] = re.search(
+                r"\"dreb\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["reb"] = re.search(
+                r"\"reb\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["ast"] = re.search(
+                r"\"ast\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["stl"] = re.search(
+                r"\"stl\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["blk"] = re.search(
+                r"\"blk\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            p_stat_kwargs["pf"] = re.search(
+                r"\"pf\">{0,1}([0-9]{1,3})", line
+            ).group(1)
+            pm = re.search(r"\"plusminus\">\+{0,1}([0-9-]{1,3})", line).group(1)
+            p_stat_kwargs["plusminus"] = pm if (pm != "--") else 0
+        except AttributeError:
+            pass
+
+        ps = PlayerStats()
+
+        # work through stats and set default value if stat not found
+        for k in fields:
+            if k not in ["player", "game_id"]:
+                ps[k] = p_stat_kwargs.get(k, 0)
+            else:
+                ps[k] = p_stat_kwargs.get(k, None)
+        players.append(dict(ps))
+    return players
+
+
+def bbref_rows_inline(rows) -> dict:
+    # the previous body of BBRefSpider.parse_basic_player: the stat map is built as a dict
+    # literal on every call and the defaults are filled in with a loop over it
+    basic_map = {
+        "fg": "fgm",
+        "fga": "fga",
+        "fg_pct": "fg_per",
+        "fg3": "x3pm",
+        "fg3a": "x3pa",
+        "fg3_pct": "x3p_per",
+        "ft": "ftm",
+        "fta": "fta",
+        "ft_pct": "ft_per",
+        "orb": "orebs",
+        "drb": "drebs",
+        "trb": "rebounds",
+        "ast": "assists",
+        "stl": "steals",
+        "blk": "blocks",
+        "tov": "turnovers",
+        "pf": "fouls",
+        "pts": "points",
+        "plus_minus": "plus_minus",
+        "mp": "mp",
+    }
+
+    player_stats = dict()
+    for row in rows:
+        header = row[0] if len(row) else None
+        if header is None or header.get("data-append-csv") is None:
+            continue
+        player_id = header.get("data-append-csv")
+        player_name = header.get("csk", ",").split(",")
+        player_obj = Player(
+            player_id=player_id,
+            last_name=player_name[0],
+            first_name=player_name[1],
+        )
+        stat_dict = map_stats(row, basic_map)
+        mp = stat_dict.pop("mp", "")
+        stat_dict["player"] = dict(player_obj)
+        stat_dict["min"] = BBRefSpider.time_string_to_hours(mp if ":" in str(mp) else "00:00")
+        for _, v in basic_map.items():
+            if v != "mp" and stat_dict.get(v, None) is None:
+                stat_dict[v] = 0
+        player_stats[player_id] = stat_dict
+    return player_stats
+
+
+def bench(name: str, fn, rows: int, number: int = 2000) -> float:
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number / rows
+    print(f"{name:<24} {seconds * 1e6:8.2f} us/row")
+    return seconds
+
+
+if __name__ == "__main__":
+    spider = BBRefSpider(urls=[])
+    context = BoxscoreContext(boxscore_response())
+    rows = stat_rows(context.table("box-POR-game-basic"))
+
+    print("basketball-reference basic player rows")
+    inline = bench("  maps per call", lambda: bbref_rows_inline(rows), len(rows))
+    schema = bench("  stat schema", lambda: spider.parse_basic_player(rows), len(rows))
+    print(f"  speedup                {inline / schema:8.2f}x")
+
+    print("espn player rows")
+    inline = bench("  patterns per call", lambda: espn_rows_inline(0, ESPN_ROWS), len(ESPN_ROWS))
+    schema = bench("  stat schema", lambda: NBAESPNSpider.new_player_stats(0, ESPN_ROWS), len(ESPN_ROWS))
+    print(f"  speedup                {inline / schema:8.2f}x")
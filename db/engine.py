@@ -0,0 +1,66 @@
+import os
+from typing import Dict, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+# One engine, and so one connection pool, per database url and process. Every nbaDB, the
+# pipelines, the known game filter and the migrator share it instead of each opening fresh
+# connections. The pool is configured from the environment:
+#
+#   DB_HOST, DB_PORT          where postgres (or pgbouncer) listens, localhost:5432
+#   DB_POOL_SIZE              connections kept open, 5
+#   DB_MAX_OVERFLOW           extra connections opened under load, 10
+#   DB_POOL_TIMEOUT           seconds to wait for a free connection, 30
+#   DB_POOL_RECYCLE           seconds before a connection is replaced, 1800
+#   DB_POOL_PRE_PING          test connections before handing them out, on
+#   DB_PGBOUNCER              set when connecting through pgbouncer in transaction mode.
+#                             pgbouncer does the pooling then, so no connections are held
+#                             open here and none outlive a transaction.
+
+_engines: Dict[Tuple[str, bool], Engine] = dict()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(int(default))).lower() in ("1", "true", "yes")
+
+
+def database_url(user: str, password: str, database: str = "nba_stats") -> str:
+    host = os.environ.get("DB_HOST", "localhost")
+    port = os.environ.get("DB_PORT", "5432")
+    return f"postgresql://{user}:{password}@{host}:{port}/{database}"
+
+
+def pool_options() -> dict:
+    if _env_bool("DB_PGBOUNCER", False):
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def get_engine(
+    user: str, password: str, database: str = "nba_stats", echo: bool = False
+) -> Engine:
+    # returns the process wide engine for a database, creating it on first use
+    url = database_url(user, password, database)
+    key = (url, echo)
+    if key not in _engines:
+        _engines[key] = create_engine(url, echo=echo, **pool_options())
+    return _engines[key]
+
+
+def dispose_engines():
+    # closes every pooled connection, for long running processes between jobs
+    for engine in _engines.values():
+        engine.dispose()
+    _engines.clear()
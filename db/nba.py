@@ -1,6 +1,7 @@
-import os
+import csv
+import io
+import threading
 from sqlalchemy import (
-    create_engine,
     Table,
     Column,
     Boolean,
@@ -8,19 +9,38 @@ from sqlalchemy import (
     String,
     Float,
     Date,
-    MetaData,
     ForeignKey,
+    UniqueConstraint,
 )
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
-from game_crawlers.nba.seasons import Seasons
-from datetime import datetime
+from db.engine import get_engine
+from game_crawlers.nba.seasons import REGULAR_SEASON, season_of, to_date
 import pytz
-from typing import List
+from typing import Dict, List
 
 
 Base = declarative_base()
 
+# postgres caps a single statement at 65535 bind parameters and player_stats rows carry
+# ~45 columns, so multi-row inserts are split into chunks of this many rows.
+INSERT_CHUNK_SIZE = 1000
+
+# conflict targets for the bulk upsert in nbaDB.add_records, in foreign key order. Tables
+# listed in DIMENSION_TABLES are only ever inserted, never updated.
+CONFLICT_KEYS = {
+    "teams": ["abbr"],
+    "players": ["id"],
+    "games": ["id"],
+    "team_stats": ["game_id", "team_abbr"],
+    "player_stats": ["game_id", "player_id"],
+}
+DIMENSION_TABLES = ("teams", "players")
+
+# marks NULL in the csv streamed to COPY, so NULLs and empty strings stay distinct
+COPY_NULL = "\\N"
+
 
 class Game(Base):
     __tablename__ = "games"
@@ -54,6 +74,7 @@ class Team(Base):
 
 class TeamStat(Base):
     __tablename__ = "team_stats"
+    __table_args__ = (UniqueConstraint("game_id", "team_abbr"),)
 
     id = Column(Integer, primary_key=True)
     game_id = Column(String, ForeignKey("games.id"))
@@ -113,6 +134,7 @@ class Player(Base):
 
 class PlayerStat(Base):
     __tablename__ = "player_stats"
+    __table_args__ = (UniqueConstraint("game_id", "player_id"),)
 
     id = Column(Integer, primary_key=True)
     player_id = Column(String, ForeignKey("players.id"))
@@ -161,151 +183,333 @@ class PlayerStat(Base):
     vorp = Column(Float)
 
 
+def row_columns(table: Table) -> List[str]:
+    # the columns of a table's row dicts, serial primary keys are left out so postgres
+    # assigns them
+    return [
+        c.key
+        for c in table.columns
+        if not (c.primary_key and isinstance(c.type, Integer))
+    ]
+
+
+# writes go through Core inserts with plain row dicts built by the nbaDB.map_* functions,
+# the ORM classes above are only used for reads.
+ROW_COLUMNS = {t.name: row_columns(t) for t in Base.metadata.sorted_tables}
+
+
+class DimensionCache:
+    """
+    Cache of the player ids and team abbreviations already stored in one database, so writing
+    a boxscore does not need a SELECT per player and team. The cache only decides whether an
+    insert is attempted, the inserts use ON CONFLICT DO NOTHING, so a missing entry costs an
+    extra insert while a stale one (a row rolled back or deleted since) would skip a needed
+    insert and fail the stats rows on their foreign keys. There is one cache per database url,
+    see dimension_cache_for, and it is emptied whenever a write rolls back. It is shared by
+    nbaDB instances on different threads, so reads and updates hold a lock.
+    """
+
+    def __init__(self):
+        self.players = set()
+        self.teams = set()
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def preload(self, session):
+        self.players.update(pid for (pid,) in session.query(Player.id))
+        self.teams.update(abbr for (abbr,) in session.query(Team.abbr))
+        self.loaded = True
+
+    def unknown(self, known: set, pending: set, keys) -> list:
+        # returns the keys that are neither cached nor pending and counts hits and misses
+        with self.lock:
+            new = [k for k in keys if k not in known and k not in pending]
+            self.misses += len(new)
+            self.hits += len(keys) - len(new)
+        return new
+
+    def add(self, players: set, teams: set):
+        with self.lock:
+            self.players.update(players)
+            self.teams.update(teams)
+
+    def clear(self):
+        # forgets everything, rows are inserted again (or conflict) until the cache refills
+        with self.lock:
+            self.players.clear()
+            self.teams.clear()
+            self.loaded = False
+
+
+_dimension_caches: Dict[str, DimensionCache] = dict()
+_dimension_caches_lock = threading.Lock()
+
+
+def dimension_cache_for(engine) -> DimensionCache:
+    # nbaDBs on the same database share a cache, other databases get their own
+    key = str(engine.url)
+    with _dimension_caches_lock:
+        if key not in _dimension_caches:
+            _dimension_caches[key] = DimensionCache()
+        return _dimension_caches[key]
+
+
 class nbaDB:
-    def __init__(self, user, password):
-        host = os.environ.get("DB_HOST", "localhost")
-        self.engine = create_engine(
-            f"postgresql://{user}:{password}@{host}:5432/nba_stats", echo=False
-        )
+    def __init__(self, user, password, database: str = "nba_stats"):
+        # the engine and its connection pool are shared by every nbaDB in the process, the
+        # session only borrows a connection from it while a transaction is open.
+        self.engine = get_engine(user, password, database)
         Sess = sessionmaker(bind=self.engine)
         self.session = Sess()
-
-    def add_record(self, record: dict):
-        team_data = record.get("team_stats")
-        player_data = record.get("player_stats")
-        g = self.map_to_db(record)
-        ps = self.map_player_stats(
-            player_data,
-            team_data.get("home_stats", {}).get("team", {}).get("abbreviation", ""),
-            team_data.get("away_stats", {}).get("team", {}).get("abbreviation", ""),
+        self.dimensions = dimension_cache_for(self.engine)
+        # ids inserted in the open transaction, moved into the cache once it commits
+        self._pending_players = set()
+        self._pending_teams = set()
+
+    def preload_dimensions(self):
+        if not self.dimensions.loaded:
+            self.dimensions.preload(self.session)
+
+    def commit(self):
+        self.session.commit()
+        self.dimensions.add(self._pending_players, self._pending_teams)
+        self._pending_players.clear()
+        self._pending_teams.clear()
+
+    def rollback(self):
+        self.session.rollback()
+        self._pending_players.clear()
+        self._pending_teams.clear()
+        # the failure may have been a foreign key violation from a stale entry
+        self.dimensions.clear()
+
+    def _new_dimensions(self, players: dict, teams: dict):
+        # filters player and team rows, keyed by primary key, down to the ones that are not
+        # cached or already pending in this transaction.
+        new_players = self.dimensions.unknown(
+            self.dimensions.players, self._pending_players, list(players)
         )
-        ts = self.map_team_stats(team_data)
-
-        players = self.map_players(player_data)
-        teams = self.map_teams(team_data)
-
-        for p in players:
-            instance = self.session.query(Player).filter(Player.id == p.id).first()
-            if not instance:
-                self.session.add(p)
+        new_teams = self.dimensions.unknown(
+            self.dimensions.teams, self._pending_teams, list(teams)
+        )
+        self._pending_players.update(new_players)
+        self._pending_teams.update(new_teams)
+        return [players[k] for k in new_players], [teams[k] for k in new_teams]
 
-        for t in teams:
-            instance = self.session.query(Team).filter(Team.abbr == t.abbr).first()
-            if not instance:
-                self.session.add(t)
+    def game_ids(self) -> set:
+        return {gid for (gid,) in self.session.query(Game.id)}
 
-        g.team_stats = ts
-        g.player_stats = ps
+    def add_record(self, record: dict):
+        # writes one boxscore with a Core executemany insert per table
+        rows = self._record_rows([record])
+        for table in DIMENSION_TABLES:
+            if rows[table]:
+                self._upsert(Base.metadata.tables[table], rows[table])
+        for table in ("games", "team_stats", "player_stats"):
+            if rows[table]:
+                self.session.execute(Base.metadata.tables[table].insert(), rows[table])
+
+    def add_records(self, records: List[dict]) -> int:
+        # Writes a batch of boxscore records with one multi-row INSERT ... ON CONFLICT per
+        # table inside a single transaction.
+        written = 0
+        for table, rows in self._record_rows(records).items():
+            if rows:
+                self._upsert(Base.metadata.tables[table], rows)
+                written += len(rows)
+        self.commit()
+        return written
+
+    def copy_records(self, records: List[dict]) -> int:
+        # Bulk load for backfills: every table's rows are streamed with COPY into a
+        # temporary staging table and merged into the real table with the same
+        # ON CONFLICT rules as add_records, all in a single transaction.
+        written = 0
+        for table, rows in self._record_rows(records).items():
+            if rows:
+                self._copy(Base.metadata.tables[table], rows)
+                written += len(rows)
+        self.commit()
+        return written
+
+    def _record_rows(self, records: List[dict]) -> dict:
+        # Builds the rows of every table for a batch of records, in foreign key order. Rows
+        # are keyed by their conflict target so a game that shows up twice in the same batch
+        # only gets written once, and players and teams already stored are left out.
+        rows = {t: dict() for t in CONFLICT_KEYS}
+        for record in records:
+            team_data = record.get("team_stats")
+            player_data = record.get("player_stats")
+            game = self.map_to_db(record)
+            mapped = {
+                "games": [game],
+                "team_stats": self.map_team_stats(team_data),
+                "player_stats": self.map_player_stats(
+                    player_data,
+                    team_data.get("home_stats", {}).get("team", {}).get("abbreviation", ""),
+                    team_data.get("away_stats", {}).get("team", {}).get("abbreviation", ""),
+                    game_id=game["id"],
+                ),
+                "players": self.map_players(player_data),
+                "teams": self.map_teams(team_data),
+            }
+            for table, table_rows in mapped.items():
+                keys = CONFLICT_KEYS[table]
+                for row in table_rows:
+                    rows[table][tuple(row[k] for k in keys)] = row
+
+        new_players, new_teams = self._new_dimensions(
+            {k[0]: v for k, v in rows["players"].items()},
+            {k[0]: v for k, v in rows["teams"].items()},
+        )
+        # sorted so concurrent writers inserting the same new players lock them in the
+        # same order
+        rows["players"] = {(r["id"],): r for r in sorted(new_players, key=lambda r: r["id"])}
+        rows["teams"] = {(r["abbr"],): r for r in sorted(new_teams, key=lambda r: r["abbr"])}
+        return {table: list(keyed.values()) for table, keyed in rows.items()}
+
+    def _upsert(self, table: Table, rows: List[dict]):
+        keys = CONFLICT_KEYS[table.name]
+        for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+            stmt = pg_insert(table).values(rows[i : i + INSERT_CHUNK_SIZE])
+            if table.name in DIMENSION_TABLES:
+                stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+            else:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=keys,
+                    set_={c: stmt.excluded[c] for c in rows[0] if c not in keys},
+                )
+            self.session.execute(stmt)
+
+    def _copy(self, table: Table, rows: List[dict]):
+        keys = CONFLICT_KEYS[table.name]
+        columns = list(rows[0])
+        column_list = ", ".join(columns)
+        staging = f"staging_{table.name}"
+        self.session.execute(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM {table.name} WITH NO DATA"
+        )
 
-        self.session.add(g)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([self._copy_value(row[c]) for c in columns])
+        buf.seek(0)
+        # COPY runs on the session's own connection so it shares its transaction
+        cursor = self.session.connection().connection.cursor()
+        cursor.copy_expert(
+            f"COPY {staging} ({column_list}) FROM STDIN "
+            f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buf,
+        )
+        cursor.close()
+
+        if table.name in DIMENSION_TABLES:
+            conflict = "DO NOTHING"
+        else:
+            updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in keys)
+            conflict = f"DO UPDATE SET {updates}"
+        self.session.execute(
+            f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {staging} "
+            f"ON CONFLICT ({', '.join(keys)}) {conflict}"
+        )
 
-    def __del__(self):
+    @staticmethod
+    def _copy_value(value):
+        if value is None:
+            return COPY_NULL
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        return value
+
+    def close(self):
+        # returns the session's connection to the pool
         self.session.close()
-        print("nbaDB connection closed")
 
-    def map_to_db(self, item: dict) -> Game:
+    def map_to_db(self, item: dict) -> dict:
         game_data = item.get("game_data")
-        s = self.get_season(game_data.get("date", ""))
-        rs = self.regular_season(game_data.get("date", ""), s)
-        game = Game(
+        game_date = to_date(game_data.get("date"))
+        season, phase = game_data.get("season"), game_data.get("phase")
+        # items written before the spider set season and phase get them from the calendar
+        if season is None and game_date is not None:
+            season, phase = season_of(game_date) or (None, None)
+        # records that couldn't be read (an empty Record) are stored as NULL, an empty string
+        # in the integer columns would fail the whole batch the game is written with
+        home_record = game_data.get("home_record") or {}
+        away_record = game_data.get("away_record") or {}
+        game = dict.fromkeys(ROW_COLUMNS["games"])
+        game.update(
             id=game_data.get("game_id", ""),
-            date=game_data.get("date", ""),
-            season=s,
-            regular_season=rs,
-            home_wins=game_data.get("home_record", {}).get("wins", ""),
-            home_losses=game_data.get("home_record", {}).get("losses", ""),
-            away_wins=game_data.get("away_record", {}).get("wins", ""),
-            away_losses=game_data.get("away_record", {}).get("losses", ""),
+            date=game_date,
+            season=season,
+            regular_season=phase == REGULAR_SEASON,
+            home_wins=home_record.get("wins"),
+            home_losses=home_record.get("losses"),
+            away_wins=away_record.get("wins"),
+            away_losses=away_record.get("losses"),
         )
         return game
 
     @staticmethod
-    def get_season(date: str) -> String:
-        try:
-            d = datetime.strptime(date, "%I:%M %p, %B %d, %Y").date()
-        except ValueError:
-            d = datetime.strptime(date, "%B %d, %Y").date()
-        for k, v in Seasons.season_info.items():
-            rss = v["regular_season_start"]
-            pse = v["post_season_end"]
-            if d >= rss.date() and d <= pse.date():
-                return k
-
-    @staticmethod
-    def regular_season(date: str, season: str) -> Boolean:
-        if season is None:
-            return False
-        try:
-            d = datetime.strptime(date, "%I:%M %p, %B %d, %Y").date()
-        except ValueError:
-            d = datetime.strptime(date, "%B %d, %Y").date()
-        rss = Seasons.season_info[season]["regular_season_start"]
-        rse = Seasons.season_info[season]["regular_season_end"]
-        if d >= rss.date() and d <= rse.date():
-            return True
-        return False
-
-    @staticmethod
-    def map_player_stats(player_data, home_pk, away_pk) -> List[PlayerStat]:
+    def map_player_stats(player_data, home_pk, away_pk, game_id=None) -> List[dict]:
         pk_map = {"home_stats": home_pk, "away_stats": away_pk}
-        player_db_list = []
+        columns = ROW_COLUMNS["player_stats"]
+        player_rows = []
         # loops through the home and away team player stats.
         for k in player_data.keys():
             # loop through each player in the home and away team player stats list.
             for ps in player_data[k]:
-                # create dictionary to pass to sqlalchemy object since most fields
-                # match exactly between scrapy and psql.
-                skip_field = ["player", "min"]
-                pass_dict = {k: v for k, v in ps.items() if k not in skip_field}
-                stat = PlayerStat(
-                    player_id=ps.get("player", "")["player_id"],
-                    team_abbr=pk_map[k],
-                    minutes=ps.get("min", ""),
-                    **pass_dict,
-                )
-                player_db_list.append(stat)
-        return player_db_list
+                # most fields match exactly between scrapy and psql, stats the item doesn't
+                # have are left NULL.
+                row = {c: ps.get(c) for c in columns}
+                row["player_id"] = ps.get("player", "")["player_id"]
+                row["game_id"] = game_id if game_id is not None else ps.get("game_id")
+                row["team_abbr"] = pk_map[k]
+                row["minutes"] = ps.get("min", "")
+                player_rows.append(row)
+        return player_rows
 
     @staticmethod
-    def map_team_stats(team_data) -> List[TeamStat]:
-        team_db_list = []
+    def map_team_stats(team_data) -> List[dict]:
+        columns = ROW_COLUMNS["team_stats"]
+        team_rows = []
         for k in team_data.keys():
             team = team_data[k]
-            # create dictionary to pass to sqlalchemy object since most fields
-            # match exactly between scrapy and psql.
-            skip_fields = ["game_id", "team", "home"]
-            pass_dict = {k: v for k, v in team.items() if k not in skip_fields}
-            team_stat = TeamStat(
-                game_id=team.get("game_id", ""),
-                team_abbr=team.get("team", {}).get("abbreviation", ""),
-                home=True if (k == "home_stats") else False,
-                **pass_dict,
-            )
-            team_db_list.append(team_stat)
-        return team_db_list
+            # most fields match exactly between scrapy and psql
+            row = {c: team.get(c) for c in columns}
+            row["team_abbr"] = team.get("team", {}).get("abbreviation", "")
+            row["home"] = True if (k == "home_stats") else False
+            team_rows.append(row)
+        return team_rows
 
     @staticmethod
-    def map_players(player_data) -> List[Player]:
+    def map_players(player_data) -> List[dict]:
         players = []
         for k in player_data.keys():
             for p in player_data[k]:
-                player = Player(
-                    id=p.get("player", {}).get("player_id", ""),
-                    first_name=p.get("player", {}).get("first_name", ""),
-                    last_name=p.get("player", {}).get("last_name", ""),
+                player = p.get("player", {})
+                players.append(
+                    {
+                        "id": player.get("player_id", ""),
+                        "first_name": player.get("first_name", ""),
+                        "last_name": player.get("last_name", ""),
+                    }
                 )
-                players.append(player)
         return players
 
     @staticmethod
-    def map_teams(team_data) -> List[Team]:
+    def map_teams(team_data) -> List[dict]:
         teams = []
         for k in team_data.keys():
-            t = team_data[k]
-            team = Team(
-                location=t.get("team", {}).get("location", ""),
-                name=t.get("team", {}).get("name", ""),
-                abbr=t.get("team", {}).get("abbreviation", ""),
+            team = team_data[k].get("team", {})
+            teams.append(
+                {
+                    "abbr": team.get("abbreviation", ""),
+                    "location": team.get("location", ""),
+                    "name": team.get("name", ""),
+                }
             )
-            teams.append(team)
         return teams
@@ -0,0 +1,153 @@
+import json
+import os
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from game_crawlers.nba.bbref_crawler import BBRefScoreboard
+from game_crawlers.nba.httpcache import url_to_date
+from game_crawlers.nba.seasons import Seasons
+
+# Backfills split the scoreboard dates into shards, a season or a calendar month each, and
+# crawl every shard in its own process (see nba_backfill.py). A shard that finishes cleanly
+# leaves a checkpoint file behind, so a run that crashed or was stopped picks up with the
+# shards that have none.
+#
+#   .scrapy/backfill/
+#     90-91.json      {"shard": "90-91", "status": "done", "urls": 229, ...}
+#     91-92.json      {"shard": "91-92", "status": "failed", "errors": 3, ...}
+
+SHARD_BY = ("season", "month")
+DEFAULT_CHECKPOINT_DIR = os.environ.get("BACKFILL_CHECKPOINT_DIR", ".scrapy/backfill")
+
+
+class Shard(NamedTuple):
+    key: str
+    urls: List[str]
+
+
+def build_shards(scoreboard: BBRefScoreboard, by: str = "season") -> List[Shard]:
+    # groups the scoreboard urls still to crawl by season ("05-06") or by month ("2006-01"),
+    # oldest first. Shards without any url left are dropped.
+    if by not in SHARD_BY:
+        raise ValueError(f"unknown shard key {by!r}, expected one of {SHARD_BY}")
+    shards: Dict[str, List[str]] = OrderedDict()
+    for season in Seasons.season_info:
+        for url in scoreboard.get_season_urls(season):
+            key = season if by == "season" else url_to_date(url).strftime("%Y-%m")
+            shards.setdefault(key, []).append(url)
+    return [Shard(key, urls) for key, urls in shards.items() if urls]
+
+
+class Checkpoints:
+    """
+    One json file per shard in `path` recording how its last crawl ended. Only shards marked
+    done are skipped on the next run, failed, interrupted and partial ones (whose season was
+    still being played) are crawled again, which is
+    cheap since stored games and cached pages are skipped.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def done(self, key: str) -> bool:
+        checkpoint = self.get(key)
+        return checkpoint is not None and checkpoint.get("status") == "done"
+
+    def save(self, key: str, status: str, **details):
+        # written to a temporary file and renamed, so a crash never leaves half a checkpoint
+        checkpoint = {
+            "shard": key,
+            "status": status,
+            "updated_at": datetime.now().isoformat(),
+            **details,
+        }
+        tmp = self._file(key) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f, default=str)
+        os.replace(tmp, self._file(key))
+
+    def reset(self):
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.path, name))
+
+
+def crawl_shard(shard: Shard, settings: dict, checkpoint_dir: str) -> dict:
+    # runs in a worker process: crawls one shard with its own reactor and database pipeline
+    # and records the outcome. Twisted's reactor can't be restarted, so every shard needs a
+    # fresh process (multiprocessing pool with maxtasksperchild=1). Errors are recorded as a
+    # failed shard instead of raised, imap_unordered would re-raise them in the coordinator
+    # and abort the shards still running.
+    details = {"urls": len(shard.urls), "games_written": 0, "requests_per_sec": 0}
+    try:
+        status, stats = _crawl(shard, settings)
+        details.update(stats)
+    except Exception as e:
+        status = "failed"
+        details["error"] = repr(e)
+    try:
+        Checkpoints(checkpoint_dir).save(shard.key, status, **details)
+    except OSError as e:
+        # the shard isn't marked done, so the next run crawls it again
+        details["error"] = details.get("error") or f"checkpoint not saved: {e!r}"
+    return {"shard": shard.key, "status": status, **details}
+
+
+def _in_progress(shard: Shard, today: Optional[date] = None) -> bool:
+    # whether the shard's last day hasn't ended yet
+    today = today or date.today()
+    dates = [d for d in map(url_to_date, shard.urls) if d is not None]
+    return not dates or max(dates) >= today
+
+
+def _crawl(shard: Shard, settings: dict) -> Tuple[str, dict]:
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from game_crawlers.nba.bbref_crawler import BBRefSpider
+    from game_crawlers.nba.schedule import ScheduleIndex
+
+    project_settings = get_project_settings()
+    project_settings.update(settings)
+    # workers log to the same terminal, tag every line with the shard
+    project_settings["LOG_FORMAT"] = (
+        f"%(asctime)s [{shard.key}] [%(name)s] %(levelname)s: %(message)s"
+    )
+    process = CrawlerProcess(project_settings)
+    crawler = process.create_crawler(BBRefSpider)
+    schedule = ScheduleIndex()
+    try:
+        process.crawl(crawler, urls=shard.urls, schedule=schedule)
+        process.start()
+    finally:
+        schedule.close()
+
+    stats = crawler.stats.get_stats()
+    errors = stats.get("log_count/ERROR", 0)
+    reason = stats.get("finish_reason")
+    if reason != "finished" or errors:
+        status = "failed"
+    elif _in_progress(shard):
+        # a shard of a season still being played finishes cleanly but has days to come,
+        # it is crawled again on the next run
+        status = "partial"
+    else:
+        status = "done"
+    return status, {
+        "finish_reason": reason,
+        "errors": errors,
+        "games_written": stats.get("db/games_written", 0),
+        "requests_per_sec": stats.get("throttle/requests_per_sec", 0),
+    }
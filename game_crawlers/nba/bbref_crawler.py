@@ -1,11 +1,46 @@
 from scrapy import Spider, Request
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
-from typing import List, Dict
-import re
-from datetime import datetime, timedelta
-
-from game_crawlers.nba.seasons import Seasons
+from typing import Iterable, Iterator, List, Dict
+from datetime import date, datetime, timedelta
+
+from game_crawlers.nba.seasons import (
+    POST_SEASON,
+    REGULAR_SEASON,
+    Seasons,
+    season_of,
+    to_date,
+)
+from game_crawlers.nba.httpcache import url_to_date
+from game_crawlers.nba.schedule import ScheduleIndex
+from game_crawlers.nba.tables import (
+    stat_rows,
+    stat_footer,
+    stat_cell,
+    cell_text,
+    comment_table,
+    rows_by_team,
+    map_stats,
+)
+from game_crawlers.nba.schema import (
+    BBREF_PLAYER_BASIC,
+    BBREF_PLAYER_BASIC_DEFAULTS,
+    BBREF_PLAYER_ADVANCED,
+    BBREF_PLAYER_ADVANCED_DEFAULTS,
+    BBREF_TEAM_BASIC,
+    BBREF_TEAM_ADVANCED,
+    BBREF_FOUR_FACTOR,
+    BBREF_LINE_SCORE,
+    BBREF_BOXSCORE_LINK_RE,
+    BBREF_TEAM_HREF_RE,
+    BBREF_BPM_TIP_RE,
+    BBREF_GAME_TIME_RE,
+    BBREF_GAME_DAY_RE,
+    BBREF_RECORD_RE,
+    BBREF_SCORE_RE,
+    PLAYER_STAT_TYPES,
+    TEAM_STAT_TYPES,
+)
 from game_crawlers.nba.fields import (
     Game,
     Record,
@@ -16,40 +51,116 @@ from game_crawlers.nba.fields import (
     TeamStats,
 )
 
-TEAM_NAME_REGEX = r"teams/(?P<abbr>[A-Z]{3}).*>(?P<name>[/A-Za-z0-9 ]+)<"
 
 class BBRefScoreboard:
     """
     Class to pull list of dates that NBA games were played using range for regular and post season
-    schedules. Some games may still be empty, but get_scoreboard_urls() will return the urls for
-    all days where a game possibly occurred.
+    schedules. Some games may still be empty, but iter_scoreboard_urls() will yield the urls for
+    all days where a game possibly occurred. Given a ScheduleIndex, days already known to be empty
+    or whose games are all in `ingested` are left out.
     """
 
-    def __init__(self):
-        pass
-
-    def get_all_scoreboard_urls(self):
-        url_list = list()
-        for _, v in Seasons.season_info.items():
-            url_list = url_list + list(
-                self._get_bbref_url(v["regular_season_start"], v["regular_season_end"])
-            )
-            url_list = url_list + list(
-                self._get_bbref_url(v["post_season_start"], v["post_season_end"])
-            )
-        return url_list
+    def __init__(self, schedule: ScheduleIndex = None, ingested: set = None):
+        self.schedule = schedule
+        self.ingested = ingested
+        self.skip_dates = None
+
+    def load_skip_dates(self):
+        # reads the days that need no request from the schedule index
+        self.skip_dates = set()
+        if self.schedule is not None:
+            self.skip_dates = self.schedule.done_dates(self.ingested)
+
+    def iter_scoreboard_urls(
+        self,
+        seasons: Iterable[str] = None,
+        phases: Iterable[str] = (REGULAR_SEASON, POST_SEASON),
+        start: date = None,
+        end: date = None,
+    ) -> Iterator[str]:
+        # yields the scoreboard urls in date order one at a time, so a spider can start on the
+        # first season without the whole calendar being expanded. Limited to the given seasons
+        # (keys of Seasons.season_info), phases and the days from start to end inclusive.
+        if self.skip_dates is None:
+            self.load_skip_dates()
+        seasons = set(seasons) if seasons else None
+        for season, v in Seasons.season_info.items():
+            if seasons is not None and season not in seasons:
+                continue
+            for phase in (REGULAR_SEASON, POST_SEASON):
+                if phase not in phases:
+                    continue
+                first, last = v[f"{phase}_start"], v[f"{phase}_end"]
+                if start is not None:
+                    first = max(first, datetime.combine(start, datetime.min.time()))
+                if end is not None:
+                    last = min(last, datetime.combine(end, datetime.min.time()))
+                yield from self._get_bbref_url(first, last)
+
+    def get_all_scoreboard_urls(self) -> List[str]:
+        return list(self.iter_scoreboard_urls())
+
+    def get_season_urls(self, season: str) -> List[str]:
+        # regular and post season scoreboard urls of one season, keyed like Seasons.season_info
+        return list(self.iter_scoreboard_urls(seasons=[season]))
 
     def get_urls_date(self, date: datetime):
         return f"https://www.basketball-reference.com/boxscores/?month={date.month}&day={date.day}&year={date.year}"
 
     def _get_bbref_url(self, start, end):
         for d in self._get_dates(start, end):
+            if d.date() in self.skip_dates:
+                continue
             yield f"https://www.basketball-reference.com/boxscores/?month={d.month}&day={d.day}&year={d.year}"
 
     @staticmethod
-    def _get_dates(start: datetime, end: datetime) -> List[datetime]:
-        d = (end + timedelta(days=1) - start).days
-        return [start + timedelta(days=i) for i in range(d)]
+    def _get_dates(start: datetime, end: datetime) -> Iterator[datetime]:
+        # an empty range when end is before start
+        for i in range((end + timedelta(days=1) - start).days):
+            yield start + timedelta(days=i)
+
+
+class BoxscoreContext:
+    """
+    Everything the boxscore sub-parsers read from a response, collected with one pass of
+    document wide queries: the stat tables indexed by id, the commented out four factor and
+    line score blocks, the scorebox and the away/home team metadata. Sub-parsers only run
+    relative queries against these, so no document wide xpath is evaluated twice.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.tables = {t.root.get("id"): t.root for t in response.xpath("//table[@id]")}
+
+        # the four factor and line score tables are only present as an html comment inside
+        # their wrapper div, which the site's javascript unwraps. The comments are parsed
+        # into their own fragments, None when the page has no such table.
+        self.four_factor = self._comment_table(response, "all_four_factors")
+        self.scoreline = self._comment_table(response, "all_line_score")
+
+        self.scorebox = response.xpath('//div[@class="scorebox"]')
+        self.scorebox_meta = response.xpath('//div[@class="scorebox_meta"]')
+
+        # team links look like <a href="/teams/POR/2006.html" itemprop="name">Portland Trail
+        # Blazers</a>, the away team is listed first.
+        teams = list()
+        for a in response.xpath("//strong/a[@itemprop='name']")[:2]:
+            abbr = BBREF_TEAM_HREF_RE.search(a.root.get("href", ""))
+            teams.append(
+                Team(
+                    name=a.root.text or "",
+                    abbreviation=abbr.group("abbr") if abbr else "",
+                )
+            )
+        self.away_team, self.home_team = teams
+
+    def table(self, table_id: str):
+        return self.tables.get(table_id)
+
+    @staticmethod
+    def _comment_table(response, div_id: str):
+        comments = response.xpath(f'//div[@id="{div_id}"]/comment()')
+        return comment_table(comments[0].root) if comments else None
 
 
 class BBRefSpider(Spider):
@@ -61,11 +172,14 @@ class BBRefSpider(Spider):
     name = "nba_boxscores"
     base_url = "https://www.basketball-reference.com"
 
-    def __init__(self, urls: List[str], *args, **kwargs):
+    def __init__(self, urls: Iterable[str], schedule: ScheduleIndex = None, *args, **kwargs):
         super(BBRefSpider, self).__init__(*args, **kwargs)
         self.urls = urls
+        self.schedule = schedule
 
     def start_requests(self):
+        # urls may be a generator (BBRefScoreboard.iter_scoreboard_urls), scrapy pulls start
+        # requests as the scheduler has room for them
         for l in self.urls:
             yield Request(
                 url=l,
@@ -74,71 +188,83 @@ class BBRefSpider(Spider):
 
     def parse_scoreboard(self, response):
         games = response.xpath('//p[@class="links"]/a/@href').extract()
+        game_ids = list()
         for g in games:
-            if re.search(r"boxscores/[0-9]", g):
-                game_id = re.search(r"boxscores/([0-9A-Z]*).html", g).group(1)
+            link = BBREF_BOXSCORE_LINK_RE.search(g)
+            if link is not None:
+                game_id = link.group("game_id")
+                game_ids.append(game_id)
                 yield Request(
                     url=self.base_url + g,
                     callback=self.parse_boxscore,
                     cb_kwargs=dict(game_id=game_id),
                 )
 
+        scoreboard_date = url_to_date(response.url)
+        if self.schedule is not None and scoreboard_date is not None:
+            self.schedule.record(scoreboard_date, game_ids)
+
     def parse_boxscore(self, response, game_id):
-        game = self.get_game_information(response, game_id)
-        team_stats = self.get_team_stats(response, game_id)
-        player_stats = self.get_player_stats(response, game_id)
+        context = BoxscoreContext(response)
+        game = self.get_game_information(context, game_id)
+        team_stats = self.get_team_stats(context, game_id)
+        player_stats = self.get_player_stats(context, game_id)
         return {
             "game_data": game,
             "team_stats": team_stats,
             "player_stats": player_stats,
         }
 
-    def get_game_information(self, response, game_id):
-        date_str = response.xpath('//div[@class="scorebox_meta"]').re_first(
-            r"[0-9]{1,2}:[0-9]{2}.*[0-9]{4}"
-        )
+    def get_game_information(self, context: BoxscoreContext, game_id):
+        date_str = context.scorebox_meta.re_first(BBREF_GAME_TIME_RE)
         if date_str is None:
-            date_str = response.xpath('//div[@class="scorebox_meta"]').re_first(
-            r"([A-Za-z]{3,8} [0-9]{1,2}, [0-9]{4})"
-        )
+            date_str = context.scorebox_meta.re_first(BBREF_GAME_DAY_RE)
 
-        records = response.xpath('//div[@class="scorebox"]/div/div').re(
-            r"[0-9]{1,2}-[0-9]{1,2}"
-        )
-        scores = response.xpath('//div[@class="scorebox"]/div/div[@class="scores"]').re(
-            "[0-9]{2,3}"
-        )
+        records = context.scorebox.xpath("./div/div").re(BBREF_RECORD_RE)
+        scores = context.scorebox.xpath('./div/div[@class="scores"]').re(BBREF_SCORE_RE)
 
         ar, hr = self.get_away_home_records(records, scores)
 
+        # the date is parsed once here, season and phase come from the season calendar
+        game_date = to_date(date_str)
+        season = season_of(game_date) if game_date is not None else None
         return dict(
             Game(
                 game_id=game_id,
-                date=date_str,
+                date=game_date,
+                season=season.season if season else None,
+                phase=season.phase if season else None,
                 home_record=dict(hr),
                 away_record=dict(ar),
             )
         )
 
-    def get_team_stats(self, response, game_id: str):
-        # team_information contains len = 2 list of strings with team name information
-        team_information = response.xpath("//strong/a[@itemprop='name']").getall()
-
-        # regex parses <a href="/teams/POR/2006.html" itemprop="name">Portland Trail Blazers</a> into groups
-        # POR -> "abbr", Portland Trail Blazers -> "name"
-        away = re.search(
-            TEAM_NAME_REGEX, team_information[0]
+    def get_team_stats(self, context: BoxscoreContext, game_id: str):
+        away_team = context.away_team
+        home_team = context.home_team
+
+        # both teams' rows of the four factor and line score tables are read in one pass
+        four_factors = self.parse_four_factor(context.four_factor)
+        scorelines = self.parse_scoreline(context.scoreline)
+        for name, table, parsed in (
+            ("four factors", context.four_factor, four_factors),
+            ("line score", context.scoreline, scorelines),
+        ):
+            for team in (away_team, home_team):
+                if team["abbreviation"] not in parsed:
+                    self.logger.warning(
+                        f"game {game_id}: {name} table has no row for {team['abbreviation']}"
+                        if table is not None
+                        else f"game {game_id}: no {name} table found"
+                    )
+
+        away_stats = self.parse_team_stats(
+            context, away_team["abbreviation"], four_factors, scorelines
         )
-        home = re.search(
-            TEAM_NAME_REGEX, team_information[1]
+        home_stats = self.parse_team_stats(
+            context, home_team["abbreviation"], four_factors, scorelines
         )
 
-        away_team = Team(name=away.group("name"), abbreviation=away.group("abbr"))
-        home_team = Team(name=home.group("name"), abbreviation=home.group("abbr"))
-
-        away_stats = self.parse_team_stats(response, away.group("abbr"))
-        home_stats = self.parse_team_stats(response, home.group("abbr"))
-
         away_stat_obj = TeamStats(
             team=dict(away_team), game_id=game_id, home=False, **away_stats
         )
@@ -147,398 +273,183 @@ class BBRefSpider(Spider):
         )
         return {"home_stats": dict(home_stat_obj), "away_stats": dict(away_stat_obj)}
 
-    def get_player_stats(self, response, game_id):
-        # team_information contains len = 2 list of strings with team name information
-        team_information = response.xpath("//strong/a[@itemprop='name']").getall()
-
-        # regex parses <a href="/teams/POR/2006.html" itemprop="name">Portland Trail Blazers</a> into groups
-        # POR -> "abbr", Portland Trail Blazers -> "name"
-        away = re.search(
-            TEAM_NAME_REGEX, team_information[0]
-        ).group("abbr")
-        home = re.search(
-            TEAM_NAME_REGEX, team_information[1]
-        ).group("abbr")
-
-        home_stats = self.parse_player_stats(response, home)
-        away_stats = self.parse_player_stats(response, away)
+    def get_player_stats(self, context: BoxscoreContext, game_id):
+        home_stats = self.parse_player_stats(context, context.home_team["abbreviation"])
+        away_stats = self.parse_player_stats(context, context.away_team["abbreviation"])
 
         return {"home_stats": home_stats, "away_stats": away_stats}
 
-    def parse_player_stats(self, response, team_abbr: str):
-        # xpath is dynamically named after the teams abbreviation, so that needs to get passed into the
-        # function so that we can accurately pull statistics. Player stats are found in body of table
-        # and xpath will return a list of stats to parse.
-        basic_xpath_str = (
-            '//table[@id="box-'
-            + team_abbr
-            + '-game-basic"]//tbody/tr[not(@class="thead")]'
-        )
-        advanced_xpath_str = (
-            '//table[@id="box-'
-            + team_abbr
-            + '-game-advanced"]//tbody/tr[not(@class="thead")]'
-        )
-
-        # Below regex returns list of html for each player on the away or home team:
-        #    '<tr><th scope="row" class="left " data-append-csv="harklma01" data-stat="player" csk="Harkless,Maurice">
-        #    <a href="/players/h/harklma01.html">Maurice Harkless</a></th><td class="right " data-stat="mp"
-        #    csk="2453">40:53</td><td class="right " data-stat="fg">6</td><td class="right " data-stat="fga">13</td>
-        #    <td class="right " data-stat="fg_pct">.462</td><td class="right iz" data-stat="fg3">0</td><td class="right "
-        #    data-stat="fg3a">4</td><td class="right " data-stat="fg3_pct">.000</td><td class="right " data-stat="ft">2
-        #    </td><td class="right " data-stat="fta">3</td><td class="right " data-stat="ft_pct">.667</td><td class="right
-        #     " data-stat="orb">1</td><td class="right " data-stat="drb">5</td><td class="right " data-stat="trb">6</td>
-        #    <td class="right " data-stat="ast">6</td><td class="right " data-stat="stl">1</td><td class="right iz" data-stat="blk">0</td><td class="right "
-        #    data-stat="tov">1</td><td class="right " data-stat="pf">3</td><td class="right " data-stat="pts">14</td>
-        #    <td class="right " data-stat="plus_minus">+10</td></tr>'
-
-        basic_list = response.xpath(basic_xpath_str).getall()
-        advanced_list = response.xpath(advanced_xpath_str).getall()
-
-        basic_stats = self.parse_basic_player(basic_list)
-        advanced_stats = self.parse_advanced_player(advanced_list)
+    def parse_player_stats(self, context: BoxscoreContext, team_abbr: str):
+        # tables are dynamically named after the teams abbreviation, so that needs to get passed
+        # into the function so that we can accurately pull statistics. Player stats are found in
+        # the body of the table, one row per player with every cell tagged by data-stat:
+        #    <tr><th scope="row" class="left " data-append-csv="harklma01" data-stat="player"
+        #    csk="Harkless,Maurice"><a href="/players/h/harklma01.html">Maurice Harkless</a></th>
+        #    <td class="right " data-stat="mp" csk="2453">40:53</td><td class="right "
+        #    data-stat="fg">6</td><td class="right " data-stat="fga">13</td> ...
+        #    <td class="right " data-stat="plus_minus">+10</td></tr>
+        basic_table = context.table("box-" + team_abbr + "-game-basic")
+        advanced_table = context.table("box-" + team_abbr + "-game-advanced")
+
+        basic_stats = self.parse_basic_player(stat_rows(basic_table))
+        advanced_stats = self.parse_advanced_player(stat_rows(advanced_table))
 
         player_stats = list()
         for p in basic_stats.keys():
-            combined = {**basic_stats[p], **advanced_stats[p]}
+            combined = {**basic_stats[p], **advanced_stats.get(p, {})}
             player = PlayerStats(**combined)
             player_stats.append(dict(player))
         return player_stats
 
-    def parse_basic_player(self, stat_list):
-        bbref_to_pstat_map_basic = {
-            "fg": "fgm",
-            "fga": "fga",
-            "fg_pct": "fg_per",
-            "fg3": "x3pm",
-            "fg3a": "x3pa",
-            "fg3_pct": "x3p_per",
-            "ft": "ftm",
-            "fta": "fta",
-            "ft_pct": "ft_per",
-            "orb": "orebs",
-            "drb": "drebs",
-            "trb": "rebounds",
-            "ast": "assists",
-            "stl": "steals",
-            "blk": "blocks",
-            "tov": "turnovers",
-            "pf": "fouls",
-            "pts": "points",
-            "plus_minus": "plus_minus",
-        }
-        re_player_info = r'data-append-csv="(?P<id>[a-z0-9]+)".+csk="(?P<name>.+)"><a'
-
-        # mp -> minutes played has an extra identifying field 'csk' within the <> so it needs to be pulled with
-        # it's own regex code.
-        re_mp = r"data-stat=\"mp\".+>(?P<val>[0-9]{2}:[0-9]{2})</td>"
-        re_stats = r"data-stat=\"(?P<stat>[a-z0-9_]+)\">(?P<val>[0-9.:+-]+)</td>"
-
+    def parse_basic_player(self, rows: list) -> dict:
         player_stats = dict()
-        for line in stat_list:
-            # this splits off the table header information for each row, which contains all of the player
-            # information, name and id. The stat group contains the <tr> sections that correspond to each
-            # players basic statistics
-            split_header = line.split("</th>")
-            name_group = split_header[0]
-            stat_group = split_header[1]
-
-            player_info = re.search(re_player_info, name_group)
+        for row in rows:
+            # the row header holds the player id and name, players that did not play only
+            # have a single "reason" cell after it.
+            header = row[0] if len(row) else None
+            if header is None or header.get("data-append-csv") is None:
+                continue
+            player_id = header.get("data-append-csv")
             # Basketball Reference uses LastName, FirstName formatting for players
-            player_name = player_info.group("name").split(",")
+            player_name = header.get("csk", ",").split(",")
             player_obj = Player(
-                player_id=player_info.group("id"),
+                player_id=player_id,
                 last_name=player_name[0],
                 first_name=player_name[1],
             )
 
-            s = re.search(re_mp, stat_group)
-            if s is not None:
-                mp = s.group("val")
-            else:
-                mp = "00:00"
+            # minutes come back as "40:53" and are converted separately
+            # missing stats keep their default value
             stat_dict = {
-                "player": dict(player_obj),
-                "min": self.time_string_to_hours(mp),
+                **BBREF_PLAYER_BASIC_DEFAULTS,
+                **map_stats(row, BBREF_PLAYER_BASIC, PLAYER_STAT_TYPES),
             }
-            parsed_stats = re.findall(re_stats, stat_group)
-            for s in parsed_stats:
-                if s[0] in bbref_to_pstat_map_basic.keys():
-                    stat_dict[bbref_to_pstat_map_basic[s[0]]] = s[1]
-
-            # sets the default values for any missing stats
-            for _, v in bbref_to_pstat_map_basic.items():
-                if stat_dict.get(v, None) is None:
-                    stat_dict[v] = 0
-            player_stats[player_info.group("id")] = stat_dict
+            mp = stat_dict.pop("mp", "")
+            stat_dict["player"] = dict(player_obj)
+            stat_dict["min"] = self.time_string_to_hours(mp if ":" in str(mp) else "00:00")
+            player_stats[player_id] = stat_dict
         return player_stats
 
-    def parse_advanced_player(self, stat_list):
-        bbref_to_pstat_map_advanced = {
-            "ts_pct": "ts_per",
-            "efg_pct": "efg_per",
-            "fg3a_per_fga_pct": "x3p_ar",
-            "fta_per_fga_pct": "ft_ar",
-            "orb_pct": "oreb_per",
-            "drb_pct": "dreb_per",
-            "trb_pct": "reb_per",
-            "ast_pct": "ast_per",
-            "stl_pct": "stl_per",
-            "blk_pct": "blk_per",
-            "tov_pct": "tov_per",
-            "usg_pct": "usg_per",
-            "off_rtg": "off_rating",
-            "def_rtg": "def_rating",
-            "bpm": "bpm",
-            "obpm": "obpm",
-            "dbpm": "dbpm",
-            "vorp": "vorp",
-        }
-        re_player_info = r'data-append-csv="(?P<id>[a-z0-9]+)".+csk="(?P<name>.+)"><a'
-        re_stats = r"data-stat=\"(?P<stat>[a-z0-9_]+)\">(?P<val>[0-9.:+]+)</td>"
-
-        # bpm field has extra information, so below regex parses all that out. Example bpm cell:
-        # <td class="right poptip" data-stat="bpm" data-tip="OBPM: -3.7&lt;br&gt; DBPM: -2.4&lt;
-        # br&gt; VORP: -3.2&lt;br&gt; &lt;em&gt;&lt;small&gt;VORP is prorated to 82 games&lt;
-        # /small&gt;&lt;/em&gt; ">-6.1</td></tr>'
-        re_bpm = r"data-stat=\"bpm\".+OBPM: (?P<obpm>[0-9.-]+)&.+DBPM: (?P<dbpm>[0-9-.]+)&.+VORP: (?P<vorp>[0-9-.]+)&.+>(?P<bpm>[0-9-.]+)</td>"
-
+    def parse_advanced_player(self, rows: list) -> dict:
         player_stats = dict()
-        for line in stat_list:
-            # this splits off the table header information for each row, which contains all of the player
-            # information, name and id. The stat group contains the <tr> sections that correspond to each
-            # players basic statistics
-            split_header = line.split("</th>")
-            name_group = split_header[0]
-            stat_group = split_header[1]
-
-            player_info = re.search(re_player_info, name_group)
-            parsed_stats = re.findall(re_stats, stat_group)
-            stat_dict = dict()
-            for s in parsed_stats:
-                if s[0] in bbref_to_pstat_map_advanced.keys():
-                    stat_dict[bbref_to_pstat_map_advanced[s[0]]] = s[1]
-            bpm_parse = re.search(re_bpm, stat_group)
-            if bpm_parse is not None:
-                stat_dict["bpm"] = bpm_parse.group("bpm")
-                stat_dict["obpm"] = bpm_parse.group("obpm")
-                stat_dict["dbpm"] = bpm_parse.group("dbpm")
-                stat_dict["vorp"] = bpm_parse.group("vorp")
-
-            for _, v in bbref_to_pstat_map_advanced.items():
-                if stat_dict.get(v, None) is None:
-                    stat_dict[v] = 0
-            player_stats[player_info.group("id")] = stat_dict
+        for row in rows:
+            header = row[0] if len(row) else None
+            if header is None or header.get("data-append-csv") is None:
+                continue
+            stat_dict = {
+                **BBREF_PLAYER_ADVANCED_DEFAULTS,
+                **map_stats(row, BBREF_PLAYER_ADVANCED, PLAYER_STAT_TYPES),
+            }
+
+            # bpm cell carries obpm, dbpm and vorp in its tooltip. Example bpm cell:
+            # <td class="right poptip" data-stat="bpm" data-tip="OBPM: -3.7&lt;br&gt; DBPM: -2.4&lt;
+            # br&gt; VORP: -3.2&lt;br&gt; &lt;em&gt;&lt;small&gt;VORP is prorated to 82 games&lt;
+            # /small&gt;&lt;/em&gt; ">-6.1</td></tr>'
+            bpm = stat_cell(row, "bpm")
+            if bpm is not None:
+                tip = BBREF_BPM_TIP_RE.search(bpm.get("data-tip", ""))
+                if tip is not None:
+                    stat_dict["obpm"] = float(tip.group("obpm"))
+                    stat_dict["dbpm"] = float(tip.group("dbpm"))
+                    stat_dict["vorp"] = float(tip.group("vorp"))
+            player_stats[header.get("data-append-csv")] = stat_dict
         return player_stats
 
     @staticmethod
     def time_string_to_hours(time: str) -> float:
         # Transforms time from 40:53 -> 40.8833
         split = time.split(":")
-        return str(int(split[0]) + (int(split[1]) / 60))
-
-    def parse_team_stats(self, response, team_abbr: str):
-        # xpath is dynamically named after the teams abbreviation, so that needs to get passed into the
-        # function so that we can accurately pull statistics. Team stats are found in foot of table
-        # and xpath will return a list of stats to parse
-        basic_xpath_str = '//table[@id="box-' + team_abbr + '-game-basic"]//tfoot//td'
-        advanced_xpath_str = (
-            '//table[@id="box-' + team_abbr + '-game-advanced"]//tfoot//td'
-        )
-
-        # something is strange with the html in the four_fact and scoreline tables, scrapy
-        # is unable to find the link when referencing the id directly to the table. The
-        # current workaround will use the string comment from the section above the table
-        # which has all the required data.
-        four_factor_xpath = '//div[@id="all_four_factors"]/comment()'
-        scoreline_xpath = '//div[@id="all_line_score"]/comment()'
-
-        basic_box = response.xpath(basic_xpath_str).getall()
-        advanced_box = response.xpath(advanced_xpath_str).getall()
-        four_factor = response.xpath(four_factor_xpath).get()
-        scoreline = response.xpath(scoreline_xpath).get()
+        return int(split[0]) + (int(split[1]) / 60)
+
+    def parse_team_stats(
+        self,
+        context: BoxscoreContext,
+        team_abbr: str,
+        four_factors: Dict[str, dict],
+        scorelines: Dict[str, dict],
+    ):
+        # tables are dynamically named after the teams abbreviation, so that needs to get passed
+        # into the function so that we can accurately pull statistics. Team stats are found in
+        # the foot of the basic and advanced tables.
+        basic_table = context.table("box-" + team_abbr + "-game-basic")
+        advanced_table = context.table("box-" + team_abbr + "-game-advanced")
 
         team_stat_dict = {}
-        team_stat_dict.update(self.parse_basic_team(basic_box))
-        team_stat_dict.update(self.parse_advanced_team(advanced_box))
-        team_stat_dict.update(self.parse_four_factor(four_factor, team_abbr))
-        team_stat_dict.update(self.parse_scoreline(scoreline, team_abbr))
+        team_stat_dict.update(self.parse_basic_team(stat_footer(basic_table)))
+        team_stat_dict.update(self.parse_advanced_team(stat_footer(advanced_table)))
+        team_stat_dict.update(four_factors.get(team_abbr, {}))
+        team_stat_dict.update(scorelines.get(team_abbr, {}))
 
         return team_stat_dict
 
-    def parse_basic_team(self, basic_box: List[str]) -> dict:
-        # basic_box is a list of cells from the basic box score table
-        # each looks like this '<td class="right " data-stat="mp">240</td>'
-
-        # maps the field names from basketball reference  basic boxscore to the expected
-        # field name specified in the spacy TeamStats object.
-        bbref_to_teamstat_map = {
-            "fg": "fgm",
-            "fga": "fga",
-            "fg_pct": "fg_per",
-            "fg3": "x3pm",
-            "fg3a": "x3pa",
-            "fg3_pct": "x3p_per",
-            "ft": "ftm",
-            "fta": "fta",
-            "ft_pct": "ft_per",
-            "orb": "orebs",
-            "drb": "drebs",
-            "trb": "rebounds",
-            "ast": "assists",
-            "stl": "steals",
-            "blk": "blocks",
-            "tov": "turnovers",
-            "pf": "fouls",
-            "pts": "points",
-        }
-        return self.parse_team_box(basic_box, bbref_to_teamstat_map)
-
-    def parse_advanced_team(self, advanced_box: str) -> dict:
-        # advanced_box is a list of cells from the advanced box score table
-        # each looks like this '<td class="right " data-stat="mp">240</td>'
-
-        # maps the field names from basketball reference advanced boxscore to the expected
-        # field name specified in the spacy TeamStats object.
-        bbref_to_teamstat_map = {
-            "ts_pct": "ts_per",
-            "efg_pct": "efg_per",
-            "fg3a_per_fga_pct": "x3p_ar",
-            "fta_per_fga_pct": "ft_ar",
-            "orb_pct": "oreb_per",
-            "drb_pct": "dreb_per",
-            "trb_pct": "reb_per",
-            "ast_pct": "ast_per",
-            "stl_pct": "stl_per",
-            "blk_pct": "blk_per",
-            "tov_pct": "tov_per",
-            "usg_pct": "usg_per",
-            "off_rtg": "off_rating",
-            "def_rtg": "def_rating",
-        }
-        return self.parse_team_box(advanced_box, bbref_to_teamstat_map)
+    def parse_basic_team(self, basic_box) -> dict:
+        # basic_box is the team totals row of the basic box score table, each cell looks
+        # like this '<td class="right " data-stat="mp">240</td>'
+        return self.parse_team_box(basic_box, BBREF_TEAM_BASIC)
 
-    @staticmethod
-    def parse_team_box(table_str: List[str], stat_map: dict) -> dict:
-        stats = {}
-        for stat in table_str:
-            match = re.search(
-                r"data-stat=\"(?P<stat>[A-Za-z0-9_]+)\">(?P<val>[0-9.]+)<", stat
-            )
-            if not match:
-                continue
-            if match.group("stat") in stat_map.keys():
-                stats[stat_map.get(match.group("stat"))] = match.group("val")
-        return stats
+    def parse_advanced_team(self, advanced_box) -> dict:
+        # advanced_box is the team totals row of the advanced box score table, each cell looks
+        # like this '<td class="right " data-stat="mp">240</td>'
+        return self.parse_team_box(advanced_box, BBREF_TEAM_ADVANCED)
 
     @staticmethod
-    def parse_four_factor(four_factor: str, abbr: str) -> dict:
-        # map for stats in the four factor group to map to scrapy fields
-        bbref_to_teamstat_map = {"pace": "pace", "ft_rate": "ft_per_fga"}
-        # FourFactor is a string comment from the html that contains all the stats since the html
-        # table can't be found via xpath. Below regex path will pull the four factor stats for the
-        # given team.
-        # Sample string:
-        #     'NJN</a></th><td class="right " data-stat="pace" >93.2</td><td class="right minus"
-        #     data-stat="efg_pct" >.395</td><td class="right plus" data-stat="tov_pct" >13.8</td>
-        #     <td class="right minus" data-stat="orb_pct" >12.5</td><td class="right plus" data-stat="ft_rate" >
-        #     .224</td><td class="right " data-stat="off_rtg" >82.6</td></tr><tr ><th scope="row" class="left "
-        #     data-stat="team_id" >'
-        clean_str = four_factor.replace("/n", "")
-        re_str = abbr + r"<.+(?=\<a)|" + abbr + r"<.+(?=</tr)"
-        snippet = re.search(re_str, clean_str)
-
-        # Given the snippet, this will return a list of tuples [(stat, value)] with the stat values
-        # returns:
-        #   [('pace', '93.2'),
-        #  ('efg_pct', '.395'),
-        #  ('tov_pct', '13.8'),
-        #  ('orb_pct', '12.5'),
-        #  ('ft_rate', '.224'),
-        #  ('off_rtg', '82.6')]
-
-        stats = re.findall(
-            r"data-stat=\"(?P<stat>[A-Za-z0-9_]+)\" >(?P<val>[0-9.]+)<", snippet.group()
-        )
-        stat_dict = dict()
-        for stat in stats:
-            if stat[0] in bbref_to_teamstat_map.keys():
-                stat_dict[bbref_to_teamstat_map.get(stat[0])] = stat[1]
-        return stat_dict
+    def parse_team_box(row, stat_map: dict) -> dict:
+        return map_stats(row, stat_map, TEAM_STAT_TYPES)
 
     @staticmethod
-    def parse_scoreline(scoreline: str, abbr: str) -> dict:
-        # map for stats in the four factor group to map to scrapy fields
-        bbref_to_teamstat_map = {
-            "1": "x1q_pts",
-            "2": "x2q_pts",
-            "3": "x3q_pts",
-            "4": "x4q_pts",
+    def parse_four_factor(four_factor) -> Dict[str, dict]:
+        # four_factor is the table parsed out of the html comment, one row per team:
+        #     <tr ><th scope="row" class="left " data-stat="team_id" ><a href="/teams/NJN/2006.html">
+        #     NJN</a></th><td class="right " data-stat="pace" >93.2</td><td class="right minus"
+        #     data-stat="efg_pct" >.395</td> ... <td class="right plus" data-stat="ft_rate" >.224</td>
+        #     <td class="right " data-stat="off_rtg" >82.6</td></tr>
+        # returns the mapped stats keyed by team abbreviation:
+        #   {"NJN": {"pace": 93.2, "ft_per_fga": 0.224}, "POR": {...}}
+        return {
+            abbr: map_stats(row, BBREF_FOUR_FACTOR, TEAM_STAT_TYPES)
+            for abbr, row in rows_by_team(four_factor).items()
         }
 
-        ot_match = r"[0-9]OT"
-        # scoreline is a string comment from the html that contains all the stats since the html
-        # table can't be found via xpath. Below regex path will pull the four factor stats for the
-        # given team.
-        # Sample string:
-        #     'NJN</a></th><td class="right " data-stat="pace" >93.2</td><td class="right minus"
-        #     data-stat="efg_pct" >.395</td><td class="right plus" data-stat="tov_pct" >13.8</td>
-        #     <td class="right minus" data-stat="orb_pct" >12.5</td><td class="right plus" data-stat="ft_rate" >
-        #     .224</td><td class="right " data-stat="off_rtg" >82.6</td></tr><tr ><th scope="row" class="left "
-        #     data-stat="team_id" >'
-        clean_str = scoreline.replace("/n", "")
-        re_str = abbr + r"<.+(?=<a)|" + abbr + r"<.+(?=</tr)"
-        snippet = re.search(re_str, clean_str)
-
-        # Given the snippet, this will return a list of tuples [(stat, value)] with the stat values
-        # returns:
-        #   [('1', '25'),
-        #  ('2', '25'),
-        #  ('3', '25'),
-        #  ('4', '25'),
-        #  ('1OT', '25'),
-        #  ('T', '125')]
-
-        stats = re.findall(
-            r"data-stat=\"(?P<stat>[A-Za-z0-9_]+)\" >(?P<val>[0-9.]+)<", snippet.group()
-        )
-        stat_dict = dict()
-        stat_dict["ot_pts"] = 0
-        for stat in stats:
-            if stat[0] in bbref_to_teamstat_map.keys():
-                stat_dict[bbref_to_teamstat_map.get(stat[0])] = stat[1]
-            elif re.match(ot_match, stat[0]):
-                stat_dict["ot_pts"] += int(stat[1])
-        stat_dict["ot_pts"] = str(stat_dict["ot_pts"])
-        return stat_dict
+    @staticmethod
+    def parse_scoreline(scoreline) -> Dict[str, dict]:
+        # scoreline is the table parsed out of the html comment, one row per team with a cell
+        # per quarter, one per overtime period (1OT, 2OT, ...) and the total (T):
+        #     <tr ><th scope="row" class="center " data-stat="team" ><a href="/teams/NJN/2006.html">
+        #     NJN</a></th><td class="center " data-stat="1" >16</td> ... <td class="center "
+        #     data-stat="1OT" >9</td><td class="center " data-stat="T" ><strong>86</strong></td></tr>
+        # returns the quarter points and summed overtime points keyed by team abbreviation
+        teams = dict()
+        for abbr, row in rows_by_team(scoreline).items():
+            stat_dict = map_stats(row, BBREF_LINE_SCORE, TEAM_STAT_TYPES)
+            ot_pts = 0
+            for cell in row:
+                if (cell.get("data-stat") or "").endswith("OT"):
+                    ot = cell_text(cell)
+                    ot_pts += int(ot) if ot.isdigit() else 0
+            stat_dict["ot_pts"] = ot_pts
+            teams[abbr] = stat_dict
+        return teams
 
     @staticmethod
-    def get_away_home_records(record_string: List[str], scores: List[int]):
+    def get_away_home_records(record_string: List[str], scores: List[str]):
         # record_string = ['away_wins-away_losses', 'home_wins'-'home_losses']
         # scores = [away_score, home_score]
-        split_away = record_string[0].split(
-            "-"
-        )  # results in ['away_wins', 'away_losses']
-        split_home = record_string[1].split(
-            "-"
-        )  # results in ['home_wins', 'home_losses']
+        away_wins, away_losses = (int(x) for x in record_string[0].split("-"))
+        home_wins, home_losses = (int(x) for x in record_string[1].split("-"))
+        away_score, home_score = int(scores[0]), int(scores[1])
 
         # BasketballReference record includes the result of the game in question
         # we need to determine game winner and update the record values for wins
         # and losses to get an accurate record up to, but not including the current game.
-        away_losses = (
-            split_away[1] if int(scores[0]) > int(scores[1]) else str(int(split_away[1]) - 1)
-        )
-        away_wins = (
-            split_away[0] if int(scores[0]) < int(scores[1]) else str(int(split_away[0]) - 1)
-        )
-
-        home_losses = (
-            split_home[1] if int(scores[1]) > int(scores[0]) else str(int(split_home[1]) - 1)
-        )
-        home_wins = (
-            split_home[0] if int(scores[1]) < int(scores[0]) else str(int(split_home[0]) - 1)
-        )
+        if away_score > home_score:
+            away_wins -= 1
+            home_losses -= 1
+        elif home_score > away_score:
+            home_wins -= 1
+            away_losses -= 1
+        else:
+            away_wins, away_losses = away_wins - 1, away_losses - 1
+            home_wins, home_losses = home_wins - 1, home_losses - 1
 
         away_record = Record(wins=away_wins, losses=away_losses)
         home_record = Record(wins=home_wins, losses=home_losses)
@@ -1,27 +1,82 @@
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pytz
 import scrapy
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from typing import List, Dict
-import re
 
+from game_crawlers.nba.bbref_crawler import BBRefSpider
+
+from game_crawlers.nba.schema import (
+    ESPN_TEAM_STATS,
+    ESPN_SHOT_STATS,
+    ESPN_TEAM_STAT_RE,
+    WHITESPACE_RE,
+    ESPN_CELL_RE,
+    ESPN_PLAYER_NAME_RE,
+    ESPN_PLAYER_SHOTS,
+    ESPN_SHOTS_RE,
+    ESPN_PLAYER_COUNTS,
+    ESPN_PLAYER_DEFAULTS,
+    PLAYER_STAT_TYPES,
+    TEAM_STAT_TYPES,
+    ESPN_TEAM_ABBREVIATIONS,
+    ESPN_RECORD_RE,
+    ESPN_GAME_TIME_RE,
+    ESPN_SCORE_RE,
+    ESPN_TEAM_NAME_RE,
+    ESPN_LINE_RE,
+    ESPN_OVER_UNDER_RE,
+)
+from game_crawlers.nba.seasons import season_of
+from game_crawlers.nba.tables import to_value
 from game_crawlers.nba.fields import (
     Game,
     Record,
     Line,
     Team,
     Player,
-    PlayerStats,
     TeamStats,
 )
 
+US_EASTERN = pytz.timezone("US/Eastern")
+
 
 class NBAESPNSpider(scrapy.Spider):
-    name = "nba_boxscores"
+    """
+    Scrapy Spider for the ESPN pages of a game: the gamecast (date, records and betting line),
+    the boxscore (player stats) and the matchup (teams and team stats). The pages of a game
+    are requested one after the other, each carrying what was parsed so far, and the last
+    one yields a single record shaped like BBRefSpider's, which nbaDB.add_record can store.
+
+    Follow-up pages are requested with a higher priority than the first page of a new game,
+    so games are finished before new ones are started and only about CONCURRENT_REQUESTS
+    partial games are held at a time. Every page has ESPN_PAGE_TIMEOUT seconds to download,
+    a game that fails or can't parse a page, has no date, or takes longer than
+    ESPN_GAME_TIMEOUT seconds overall is dropped and counted in the espn/incomplete_games
+    stat.
+    """
 
-    def __init__(self, ids: List[int], *args, **kwargs):
+    name = "nba_boxscores"
+    # page order of a game, each with the parser filling in its part of the record
+    pages = (
+        ("gamecast", "parse_game", "game_data"),
+        ("boxscore", "parse_boxscore", "player_stats"),
+        ("teamstats", "parse_teamstats", "team_stats"),
+    )
+
+    def __init__(self, ids: Iterable[int], *args, **kwargs):
         super(NBAESPNSpider, self).__init__(*args, **kwargs)
         self.game_ids = ids
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(NBAESPNSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.page_timeout = crawler.settings.getfloat("ESPN_PAGE_TIMEOUT", 30)
+        spider.game_timeout = crawler.settings.getfloat("ESPN_GAME_TIMEOUT", 300)
+        return spider
+
     @staticmethod
     def get_urls(game_id: int):
         return {
@@ -32,55 +87,81 @@ class NBAESPNSpider(scrapy.Spider):
 
     def start_requests(self):
         for g in self.game_ids:
-            urls = self.get_urls(g)
-            yield scrapy.Request(
-                url=urls["gamecast"],
-                callback=self.parse_game,
-                cb_kwargs=dict(game_id=g),
-            )
-            yield scrapy.Request(
-                url=urls["boxscore"],
-                callback=self.parse_boxscore,
-                cb_kwargs=dict(game_id=g),
-            )
-            yield scrapy.Request(
-                url=urls["teamstats"],
-                callback=self.parse_teamstats,
-                cb_kwargs=dict(game_id=g),
-            )
-
-    # Parses game information located in the gamecast tab of a game ESPN recorded
-    def parse_game(self, response, game_id):
-        record_re = r"[0-9]{1,2}-[0-9]{1,2}"
-        time_re = r"data-date=\"([A-Z0-9-:]*)\""
-
-        away_record = self.new_record(
-            response.xpath('//div[@class="team away"]//div[@class="record"]').re_first(
-                record_re
-            )
+            yield self.page_request(g, 0, {}, time.monotonic())
+
+    def page_request(self, game_id, step: int, record: dict, started: float):
+        page, _, _ = self.pages[step]
+        return scrapy.Request(
+            url=self.get_urls(game_id)[page],
+            callback=self.parse_page,
+            errback=self.page_failed,
+            priority=step,
+            meta={"download_timeout": getattr(self, "page_timeout", 30)},
+            cb_kwargs=dict(game_id=game_id, step=step, record=record, started=started),
         )
 
-        away_away_record = self.new_record(
-            response.xpath(
-                '//div[@class="team away"]//div[@class="record"]/span[@class="inner-record"]'
-            ).re_first(record_re)
-        )
+    def parse_page(self, response, game_id, step: int, record: dict, started: float):
+        page, parser, key = self.pages[step]
+        if time.monotonic() - started > getattr(self, "game_timeout", 300):
+            self.incomplete(game_id, f"timed out before the {page} page")
+            return
+        try:
+            record = {**record, key: getattr(self, parser)(response, game_id)}
+        except Exception as e:
+            # a page missing a node or holding an odd value (no team name, a record that
+            # isn't "W-L") drops the game like a failed download
+            self.incomplete(game_id, f"could not parse the {page} page: {e!r}")
+            return
+        if key == "game_data" and record[key].get("date") is None:
+            # games.date can't be null, one undated game would fail a whole database batch
+            self.incomplete(game_id, "no game date on the gamecast page")
+            return
+        if step + 1 < len(self.pages):
+            yield self.page_request(game_id, step + 1, record, started)
+        else:
+            yield self.assemble(record)
+
+    def page_failed(self, failure):
+        request = failure.request
+        page, _, _ = self.pages[request.cb_kwargs["step"]]
+        self.incomplete(request.cb_kwargs["game_id"], f"{page} page failed: {failure.value!r}")
+
+    def incomplete(self, game_id, reason: str):
+        self.logger.warning(f"dropping game {game_id}, {reason}")
+        self.crawler.stats.inc_value("espn/incomplete_games", spider=self)
+
+    def assemble(self, record: dict) -> dict:
+        # the gamecast shows the records after the game, like basketball-reference, so the
+        # result is taken back out with the score from the matchup page
+        game = record["game_data"]
+        records = game.pop("records", None)
+        team_stats = record["team_stats"]
+        scores = [team_stats[k].get("points") for k in ("away_stats", "home_stats")]
+        if records and all(records) and None not in scores:
+            away, home = BBRefSpider.get_away_home_records(records, scores)
+            game["away_record"], game["home_record"] = dict(away), dict(home)
+        return {
+            "game_data": game,
+            "team_stats": team_stats,
+            "player_stats": record["player_stats"],
+        }
 
-        home_record = self.new_record(
-            response.xpath('//div[@class="team home"]//div[@class="record"]').re_first(
-                record_re
-            )
-        )
+    # Parses game information located in the gamecast tab of a game ESPN recorded
+    def parse_game(self, response, game_id):
+        record_re = ESPN_RECORD_RE
 
-        home_home_record = self.new_record(
-            response.xpath(
-                '//div[@class="team home"]//div[@class="record"]/span[@class="inner-record"]'
-            ).re_first(record_re)
-        )
+        away_record = response.xpath(
+            '//div[@class="team away"]//div[@class="record"]'
+        ).re_first(record_re)
+        home_record = response.xpath(
+            '//div[@class="team home"]//div[@class="record"]'
+        ).re_first(record_re)
 
         game_time = response.xpath(
             '//div[@class="game-date-time"]//span[@data-date]'
-        ).re_first(time_re)
+        ).re_first(ESPN_GAME_TIME_RE)
+        game_date = self.game_day(game_time)
+        season = season_of(game_date) if game_date is not None else None
 
         bet_info = response.xpath('//div[@class="odds-details"]//li').getall()
         game_line = (
@@ -89,14 +170,17 @@ class NBAESPNSpider(scrapy.Spider):
             else Line(favorite="n/a", spread=0, ou=0)
         )
 
-        game = Game(game_id=game_id)
-        game["date"] = game_time
-        game["home_record"] = dict(home_record)
-        game["home_home_record"] = dict(home_home_record)
-        game["away_record"] = dict(away_record)
-        game["away_away_record"] = dict(away_away_record)
-        game["line"] = dict(game_line)
-        return {"type": "game", "game_id": game_id, "data": dict(game)}
+        game = Game(
+            game_id=game_id,
+            date=game_date,
+            season=season.season if season else None,
+            phase=season.phase if season else None,
+            home_record=dict(self.new_record(home_record)),
+            away_record=dict(self.new_record(away_record)),
+            line=dict(game_line),
+        )
+        # the raw records are kept until assemble() can correct them for the result
+        return {**dict(game), "records": [away_record, home_record]}
 
     # parse_matchup parses the nba matchup tab and returns team summary statistics
     def parse_teamstats(self, response, game_id):
@@ -122,33 +206,36 @@ class NBAESPNSpider(scrapy.Spider):
 
         away_score = response.xpath(
             '//div[@class="team away"]//div[@class="score-container"]'
-        ).re_first(r"[0-9]{2,3}")
+        ).re_first(ESPN_SCORE_RE)
+        away_score = to_value(away_score)
         home_score = response.xpath(
             '//div[@class="team home"]//div[@class="score-container"]'
-        ).re_first(r"[0-9]{2,3}")
+        ).re_first(ESPN_SCORE_RE)
+        home_score = to_value(home_score)
 
         team_stat_strings = response.xpath("//tr[@data-stat-attr]").getall()
 
         away_team_stat = TeamStats(
-            team=dict(away_team), game_id=game_id, pts=away_score, home=False
+            team=dict(away_team), game_id=game_id, points=away_score, home=False
         )
         home_team_stat = TeamStats(
-            team=dict(home_team), game_id=game_id, pts=home_score, home=True
+            team=dict(home_team), game_id=game_id, points=home_score, home=True
         )
 
         stats_dict = self.new_team_stats(team_stat_strings)
         # work through stats and set default value if stat not found
 
-        no_default = ["team", "game_id", "home", "pts"]
+        no_default = ["team", "game_id", "home", "points"]
         for field in fields:
             if field not in no_default:
-                home_team_stat[field] = stats_dict.get("home").get(field, 0)
-                away_team_stat[field] = stats_dict.get("away").get(field, 0)
+                zero = TEAM_STAT_TYPES.get(field, int)(0)
+                home_team_stat[field] = stats_dict.get("home").get(field, zero)
+                away_team_stat[field] = stats_dict.get("away").get(field, zero)
 
         team_stats = dict()
         team_stats["home_stats"] = dict(home_team_stat)
         team_stats["away_stats"] = dict(away_team_stat)
-        return {"type": "team_stats", "game_id": game_id, "data": team_stats}
+        return team_stats
 
     # parse_boxscore parses the nba boxscore html page and returns lists of player stats.
     def parse_boxscore(self, response, game_id: str):
@@ -167,64 +254,45 @@ class NBAESPNSpider(scrapy.Spider):
         player_stats = dict()
         player_stats["home_stats"] = home_team_stats
         player_stats["away_stats"] = away_team_stats
-        return {"type": "player_stats", "game_id": game_id, "data": player_stats}
-
-    def new_team_stats(self, team_stat: List[str]) -> Dict:
-        stat_map = {
-            "fieldGoalsMade": "fgm",
-            "fieldGoalsAttempted": "fga",
-            "fieldGoalPct": "fg_per",
-            "threePointFieldGoalsMade": "x3pm",
-            "threePointFieldGoalsAttempted": "x3pa",
-            "threePointFieldGoalPct": "x3p_per",
-            "freeThrowsMade": "ftm",
-            "freeThrowsAttempted": "fta",
-            "freeThrowPct": "ft_per",
-            "totalRebounds": "reb",
-            "offensiveRebounds": "oreb",
-            "defensiveRebounds": "dreb",
-            "assists": "ast",
-            "steals": "stl",
-            "blocks": "blk",
-            "totalTurnovers": "to",
-            "turnoverPoints": "pts_off_to",
-            "fastBreakPoints": "fast_break_pts",
-            "pointsInPaint": "points_in_paint",
-            "fouls": "pf",
-            "technicalFouls": "technical",
-            "flagrantFouls": "flagrant",
-            "largestLead": "largest_lead",
-        }
+        return player_stats
 
-        shot_list = [
-            "fieldGoalsMade-fieldGoalsAttempted",
-            "threePointFieldGoalsMade-threePointFieldGoalsAttempted",
-            "freeThrowsMade-freeThrowsAttempted",
-        ]
+    @staticmethod
+    def game_day(game_time: str) -> Optional[date]:
+        # data-date is the tip-off in UTC ("2006-01-04T00:30Z"), games are dated by the day
+        # they were played in the US, as on basketball-reference
+        if not game_time:
+            return None
+        try:
+            tip_off = datetime.strptime(game_time, "%Y-%m-%dT%H:%MZ")
+        except ValueError:
+            return None
+        return pytz.utc.localize(tip_off).astimezone(US_EASTERN).date()
 
-        stat_re = r"data-stat-attr.*\"(?P<stat>[a-zA-Z-]*)\".*>(?P<away>[0-9-]+).*>(?P<home>[0-9-]+)"
+    def new_team_stats(self, team_stat: List[str]) -> Dict:
         combined_stat_dict = {"home": dict(), "away": dict()}
 
         for s in team_stat:
             # remove whitespace characters so regex works
-            s = re.sub(r"[\s]", "", s)
-            stats = re.search(stat_re, s)
+            s = WHITESPACE_RE.sub("", s)
+            stats = ESPN_TEAM_STAT_RE.search(s)
+            if stats is None:
+                continue
 
-            if stats.group("stat") in shot_list:
+            if stats.group("stat") in ESPN_SHOT_STATS:
                 stat_made, stat_attempt = self.split_stat_name(stats.group("stat"))
                 home_made_val, home_att_val = self.split_shots(stats.group("home"))
                 away_made_val, away_att_val = self.split_shots(stats.group("away"))
-                mapped_stat_made = stat_map.get(stat_made)
-                mapped_stat_att = stat_map.get(stat_attempt)
+                mapped_stat_made = ESPN_TEAM_STATS.get(stat_made)
+                mapped_stat_att = ESPN_TEAM_STATS.get(stat_attempt)
                 combined_stat_dict["home"][mapped_stat_made] = home_made_val
                 combined_stat_dict["home"][mapped_stat_att] = home_att_val
                 combined_stat_dict["away"][mapped_stat_made] = away_made_val
                 combined_stat_dict["away"][mapped_stat_att] = away_att_val
 
-            else:
-                mapped_stat = stat_map.get(stats.group("stat"))
-                combined_stat_dict["home"][mapped_stat] = stats.group("home")
-                combined_stat_dict["away"][mapped_stat] = stats.group("away")
+            elif stats.group("stat") in ESPN_TEAM_STATS:
+                mapped_stat = ESPN_TEAM_STATS[stats.group("stat")]
+                combined_stat_dict["home"][mapped_stat] = to_value(stats.group("home"))
+                combined_stat_dict["away"][mapped_stat] = to_value(stats.group("away"))
 
         return combined_stat_dict
 
@@ -236,19 +304,18 @@ class NBAESPNSpider(scrapy.Spider):
     @staticmethod
     def split_shots(shots: str) -> tuple:
         s = shots.split("-")
-        return (s[0], s[1])
+        return (to_value(s[0]), to_value(s[1]))
 
     # new_player_stats parses the boxscore html table and returns player stats corresponding
-    # to each row in the table
+    # to each row in the table. The roster is read into one column per stat and the shooting
+    # percentages are computed for the whole roster at once.
     @staticmethod
-    def new_player_stats(game_id: int, boxscore: List[str]) -> List[PlayerStats]:
-        name_re = r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+).*position\">(?P<pos>[A-Z]{1,2})"
-
-        players = list()
-        fields = PlayerStats().fields
+    def new_player_stats(game_id: int, boxscore: List[str]) -> List[dict]:
+        players, cells = list(), list()
         for line in boxscore:
-            # find name information on the table row
-            re_name = re.search(name_re, line)
+            row = dict(ESPN_CELL_RE.findall(line))
+            # find name information in the name cell, header and team totals rows have none
+            re_name = ESPN_PLAYER_NAME_RE.search(row.get("name", ""))
             if not re_name:
                 continue
             player = Player(
@@ -257,123 +324,102 @@ class NBAESPNSpider(scrapy.Spider):
                 last_name=re_name.group("last"),
                 position=re_name.group("pos"),
             )
-            p_stat_kwargs = {"player": dict(player), "game_id": game_id}
+            players.append(dict(player))
+            cells.append(row)
+        if not players:
+            return []
+
+        # each stat is converted as a whole column, a column with a cell that is missing or not
+        # a number (DNP rows, "--") is converted cell by cell so only that cell falls back to
+        # its default instead of the rest of the row
+        columns = dict()
+        for cls, (made, attempts, pct) in ESPN_PLAYER_SHOTS.items():
+            shots = NBAESPNSpider.shot_column([c.get(cls) for c in cells])
+            columns[made], columns[attempts] = shots[:, 0], shots[:, 1]
+            columns[pct] = np.divide(
+                shots[:, 0],
+                shots[:, 1],
+                out=np.zeros(len(cells)),
+                where=shots[:, 1] != 0,
+            )
+        for cls, field in ESPN_PLAYER_COUNTS.items():
+            columns[field] = NBAESPNSpider.count_column(
+                [c.get(cls) for c in cells], PLAYER_STAT_TYPES.get(field, int)
+            )
 
-            # check whether play was a DNP and then pull stats
-            try:
-                # define the regex statements for shooting statistics per line
-                ft_re = re.search(r"\"ft\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
-                x3p_re = re.search(r"\"3pt\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
-                fg_re = re.search(r"\"fg\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
-
-                # parse and calculate shooting fields
-
-                p_stat_kwargs["fta"] = int(ft_re.group("a"))
-                p_stat_kwargs["ftm"] = int(ft_re.group("m"))
-                if p_stat_kwargs["fta"] != 0:
-                    p_stat_kwargs["ft_per"] = int(ft_re.group("m")) / int(
-                        ft_re.group("a")
-                    )
-                else:
-                    p_stat_kwargs["ft_per"] = 0
-
-                p_stat_kwargs["fga"] = int(fg_re.group("a"))
-                p_stat_kwargs["fgm"] = int(fg_re.group("m"))
-                if p_stat_kwargs["fga"] != 0:
-                    p_stat_kwargs["fg_per"] = int(fg_re.group("m")) / int(
-                        fg_re.group("a")
-                    )
-                else:
-                    p_stat_kwargs["fg_per"] = 0
-
-                p_stat_kwargs["x3pa"] = int(x3p_re.group("a"))
-                p_stat_kwargs["x3pm"] = int(x3p_re.group("m"))
-                if p_stat_kwargs["x3pa"] != 0:
-                    p_stat_kwargs["x3p_per"] = int(x3p_re.group("m")) / int(
-                        x3p_re.group("a")
-                    )
-                else:
-                    p_stat_kwargs["x3p_per"] = 0
-
-                # parse general statistic fields
-                p_stat_kwargs["min"] = re.search(
-                    r"\"min\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["pts"] = re.search(
-                    r"\"pts\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["oreb"] = re.search(
-                    r"\"oreb\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["dreb"] = re.search(
-                    r"\"dreb\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["reb"] = re.search(
-                    r"\"reb\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["ast"] = re.search(
-                    r"\"ast\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["stl"] = re.search(
-                    r"\"stl\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["blk"] = re.search(
-                    r"\"blk\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["pf"] = re.search(
-                    r"\"pf\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                pm = re.search(r"\"plusminus\">\+{0,1}([0-9-]{1,3})", line).group(1)
-                p_stat_kwargs["plusminus"] = pm if (pm != "--") else 0
-            except AttributeError:
-                pass
+        # back to one dict per player, tolist() turns the numpy scalars into python numbers
+        fields = list(columns)
+        rows = zip(*(columns[f].tolist() for f in fields))
+        stats = list()
+        for player, values in zip(players, rows):
+            ps = dict(ESPN_PLAYER_DEFAULTS, player=player, game_id=game_id)
+            ps.update(zip(fields, values))
+            stats.append(ps)
+        return stats
 
-            ps = PlayerStats()
+    @staticmethod
+    def shot_column(texts: List[Optional[str]]) -> np.ndarray:
+        # made-attempted cells ("6-13") as an (n, 2) int array, anything else counts as no shots
+        try:
+            shots = np.array([t.split("-") for t in texts], dtype=int)
+            if shots.shape == (len(texts), 2):
+                return shots
+        except (AttributeError, ValueError):
+            pass
+        shots = np.zeros((len(texts), 2), dtype=int)
+        for i, t in enumerate(texts):
+            match = ESPN_SHOTS_RE.match((t or "").strip())
+            if match is not None:
+                shots[i] = int(match.group("m")), int(match.group("a"))
+        return shots
 
-            # work through stats and set default value if stat not found
-            for k in fields:
-                if k not in ["player", "game_id"]:
-                    ps[k] = p_stat_kwargs.get(k, 0)
-                else:
-                    ps[k] = p_stat_kwargs.get(k, None)
-            players.append(dict(ps))
-        return players
+    @staticmethod
+    def count_column(texts: List[Optional[str]], convert) -> np.ndarray:
+        # missing cells are None, which numpy would turn into nan for float columns
+        if None not in texts:
+            try:
+                return np.array(texts, dtype=convert)
+            except ValueError:
+                pass
+        column = np.zeros(len(texts), dtype=convert)
+        for i, t in enumerate(texts):
+            try:
+                column[i] = convert(t)
+            except (TypeError, ValueError):
+                continue
+        return column
 
-    # new_record splits the record string and returns a Record object.
+    # new_record splits the record string ("wins-losses") and returns a Record object.
     @staticmethod
     def new_record(record: str) -> Record:
         if record is not None:
             r = record.split("-")
-            return Record(losses=r[0], wins=r[1])
+            return Record(wins=int(r[0]), losses=int(r[1]))
         return Record()
 
     # new_team parses the team html string, including location, full name, and abbreviation
     @staticmethod
     def new_team(html_str: str) -> Team:
-        team_re = r">([A-Za-z0-9/ ]+)<"
-        out = re.findall(team_re, html_str)
+        out = ESPN_TEAM_NAME_RE.findall(html_str)
         return Team(
             location=out[0],
-            name=out[1],
-            abbreviation=out[2],
+            name=f"{out[0]} {out[1]}",
+            abbreviation=ESPN_TEAM_ABBREVIATIONS.get(out[2], out[2]),
         )
 
     # new_line returns the over/under and spread information for a game
     @staticmethod
     def new_line(html_list: List[str]) -> Line:
-        even_re = r"EVEN"
-        line_re = r"([A-Z]{2,3} [0-9-.]+)"
-        ou_re = r"([0-9]{2,3})"
         line_fav = None
         spread = None
         o = None
         for l in html_list:
-            if re.search("Line", l):
-                if re.search(even_re, l):
+            if "Line" in l:
+                if "EVEN" in l:
                     line_fav = "EVEN"
                     spread = 0
                 else:
-                    line = re.search(line_re, l)
+                    line = ESPN_LINE_RE.search(l)
                     if line is None:
                         line_fav = None
                         spread = None
@@ -381,8 +427,8 @@ class NBAESPNSpider(scrapy.Spider):
                         line_split = line.group(0).split()
                         line_fav = line_split[0]
                         spread = float(line_split[1])
-            elif re.search("Over/Under", l):
-                ou = re.search(ou_re, l)
+            elif "Over/Under" in l:
+                ou = ESPN_OVER_UNDER_RE.search(l)
                 if ou is None:
                     o = None
                 else:
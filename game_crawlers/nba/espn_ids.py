@@ -0,0 +1,191 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import urllib3
+from urllib3.util.retry import Retry
+
+from game_crawlers.nba.game_id_store import DEFAULT_PATH, GameIdStore
+from game_crawlers.nba.schema import (
+    ESPN_GAME_ID_RE,
+    ESPN_SCOREBOARD_EVENT_KEYS,
+    ESPN_SCOREBOARD_JSON_RE,
+)
+from game_crawlers.nba.seasons import POST_SEASON, REGULAR_SEASON, Seasons
+from game_crawlers.nba.throttle import RateLimiter
+
+# Finds the ESPN game ids played on each day with plain http requests, the browserless
+# alternative to GameDriver in game_ids.py. Scoreboard days are fetched concurrently over a
+# pooled connection, rate limited, and the ids are read from the json the page embeds,
+# falling back to the game links in the html. Ids are stored by day in the GameIdStore,
+# days already fetched after they were over are skipped unless --refetch is given.
+#
+#   python -m game_crawlers.nba.espn_ids --season 05-06 --workers 8
+
+ESPN_SCOREBOARD_URL = "https://www.espn.com/nba/scoreboard/_/date/"
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _event_ids(node) -> Optional[List[str]]:
+    # depth first search for the first list of events under one of the event keys
+    if isinstance(node, dict):
+        for key in ESPN_SCOREBOARD_EVENT_KEYS:
+            events = node.get(key)
+            if isinstance(events, list) and all(
+                isinstance(e, dict) and "id" in e for e in events
+            ):
+                return [str(e["id"]) for e in events]
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        ids = _event_ids(child)
+        if ids is not None:
+            return ids
+    return None
+
+
+def extract_game_ids(html: str) -> List[str]:
+    # game ids of a scoreboard page in the order they are listed, from the embedded
+    # scoreboard json when the page has it and from the game links otherwise
+    match = ESPN_SCOREBOARD_JSON_RE.search(html)
+    if match:
+        try:
+            data, _ = json.JSONDecoder().raw_decode(html, match.end())
+        except ValueError:
+            data = None
+        ids = _event_ids(data)
+        if ids is not None:
+            return list(dict.fromkeys(ids))
+    return list(dict.fromkeys(m.group("game_id") for m in ESPN_GAME_ID_RE.finditer(html)))
+
+
+class ScoreboardFetcher:
+    """
+    Fetches ESPN scoreboard days on `workers` threads sharing one connection pool. Requests
+    are spaced by a RateLimiter of `rate` requests per second, failed requests (connection
+    errors, timeouts, 429 and 5xx answers) are retried `retries` times with a backoff. The
+    retries are made here rather than by urllib3 so each attempt goes through the limiter,
+    and a Retry-After pauses every worker. Fetched days are upserted into `store`, days that still fail are
+    reported and left out, so a rerun fills them in.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ESPN_SCOREBOARD_URL,
+        workers: int = 8,
+        rate: float = 4.0,
+        timeout: float = 15,
+        retries: int = 3,
+        store: GameIdStore = None,
+    ):
+        self.base_url = base_url
+        self.workers = workers
+        self.retries = retries
+        self.store = store if store is not None else GameIdStore()
+        self.http = urllib3.PoolManager(
+            maxsize=workers,
+            headers={"User-Agent": USER_AGENT},
+            timeout=urllib3.Timeout(connect=5, read=timeout),
+            # only redirects are followed by urllib3, fetch() retries the rest
+            retries=Retry(total=None, connect=0, read=0, status=0, redirect=3),
+        )
+        self.limiter = RateLimiter(rate, burst=workers)
+
+    def _date_to_url(self, d: datetime) -> str:
+        return f"{self.base_url}{d.year}{d.month :02d}{d.day :02d}"
+
+    def fetch(self, date: datetime) -> Optional[List[str]]:
+        # game ids played on a day, None when the scoreboard couldn't be fetched
+        url = self._date_to_url(date)
+        for attempt in range(self.retries + 1):
+            backoff = 0.5 * 2 ** attempt
+            self.limiter.wait()
+            try:
+                response = self.http.request("GET", url)
+            except urllib3.exceptions.HTTPError as e:
+                error = str(e)
+            else:
+                if response.status == 200:
+                    return extract_game_ids(response.data.decode("utf-8", "replace"))
+                error = f"status {response.status}"
+                if response.status not in RETRY_STATUSES:
+                    break
+                retry_after = self._retry_after(response)
+                if retry_after:
+                    self.limiter.pause(retry_after)
+                    backoff = max(backoff, retry_after)
+            if attempt < self.retries:
+                time.sleep(backoff)
+        print(f"failed to get scoreboard for {date:%Y-%m-%d}: {error}")
+        return None
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        # only the delay in seconds form is used, ESPN doesn't send dates
+        try:
+            return max(0.0, float(response.headers.get("Retry-After", 0)))
+        except ValueError:
+            return 0.0
+
+    def _fetch_and_write(self, date: datetime) -> Optional[List[str]]:
+        games = self.fetch(date)
+        if games is not None:
+            self.store.upsert(date, games)
+        return games
+
+    def get_games_dates(self, dates: List[datetime]) -> Dict[datetime, Optional[List[str]]]:
+        # fetches and writes every day, returns {day: game ids or None if it failed}
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="espn-ids") as pool:
+            return dict(zip(dates, pool.map(self._fetch_and_write, dates)))
+
+    def get_games_daterange(
+        self, start: datetime, end: datetime
+    ) -> Dict[datetime, Optional[List[str]]]:
+        if start > end:
+            raise ValueError("start date cannot be later than end date")
+        return self.get_games_dates(list(_dates(start, end)))
+
+
+def _dates(start: datetime, end: datetime) -> Iterator[datetime]:
+    for i in range((end + timedelta(days=1) - start).days):
+        yield start + timedelta(days=i)
+
+
+def season_dates(seasons: List[str] = None) -> Iterator[datetime]:
+    # every regular and post season day of the given seasons, all seasons by default
+    for season, v in Seasons.season_info.items():
+        if seasons and season not in seasons:
+            continue
+        for phase in (REGULAR_SEASON, POST_SEASON):
+            yield from _dates(v[f"{phase}_start"], v[f"{phase}_end"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="find ESPN game ids without a browser")
+    parser.add_argument("--season", action="append", choices=list(Seasons.season_info))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0, help="requests per second")
+    parser.add_argument("--store", default=DEFAULT_PATH)
+    parser.add_argument("--refetch", action="store_true", help="fetch days already stored")
+    args = parser.parse_args()
+
+    store = GameIdStore(args.store)
+    fetcher = ScoreboardFetcher(workers=args.workers, rate=args.rate, store=store)
+    settled = set() if args.refetch else store.settled_dates(seasons=args.season)
+    dates = [d for d in season_dates(args.season) if d.date() not in settled]
+    t = time.monotonic()
+    results = fetcher.get_games_dates(dates)
+    failed = [d for d, games in results.items() if games is None]
+    found = sum(len(games) for games in results.values() if games)
+    print(
+        f"found {found} games on {len(dates) - len(failed)} days in "
+        f"{time.monotonic() - t:.0f} seconds, {len(failed)} days failed"
+    )
+    store.close()
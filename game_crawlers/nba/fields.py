@@ -1,27 +1,45 @@
+from typing import Callable, Dict, Type
+
 import scrapy
 
+# Numeric fields carry a converter in their metadata, the type the parsers convert the
+# scraped text to (ints for counts, floats for rates and minutes played), so items hold
+# typed values from the moment they are built.
+
+
+def converters(item: Type[scrapy.Item]) -> Dict[str, Callable]:
+    # {field name: converter} for every typed field of an item class
+    return {
+        name: field["converter"]
+        for name, field in item.fields.items()
+        if "converter" in field
+    }
+
 
 class Game(scrapy.Item):
     game_id = scrapy.Field()
     date = scrapy.Field()
+    season = scrapy.Field()
+    phase = scrapy.Field()
     home_record = scrapy.Field()
     away_record = scrapy.Field()
     line = scrapy.Field()
 
 
 class Record(scrapy.Item):
-    wins = scrapy.Field()
-    losses = scrapy.Field()
+    wins = scrapy.Field(converter=int)
+    losses = scrapy.Field(converter=int)
 
 
 class Line(scrapy.Item):
     favorite = scrapy.Field()
-    spread = scrapy.Field()
-    ou = scrapy.Field()
+    spread = scrapy.Field(converter=float)
+    ou = scrapy.Field(converter=int)
 
 
 class Team(scrapy.Item):
     abbreviation = scrapy.Field()
+    location = scrapy.Field()
     name = scrapy.Field()
 
 
@@ -29,45 +47,45 @@ class TeamStats(scrapy.Item):
     team = scrapy.Field()
     game_id = scrapy.Field()
     home = scrapy.Field()
-    fgm = scrapy.Field()
-    fga = scrapy.Field()
-    fg_per = scrapy.Field()
-    x3pa = scrapy.Field()
-    x3pm = scrapy.Field()
-    x3p_per = scrapy.Field()
-    fta = scrapy.Field()
-    ftm = scrapy.Field()
-    ft_per = scrapy.Field()
-    orebs = scrapy.Field()
-    drebs = scrapy.Field()
-    rebounds = scrapy.Field()
-    assists = scrapy.Field()
-    steals = scrapy.Field()
-    blocks = scrapy.Field()
-    turnovers = scrapy.Field()
-    fouls = scrapy.Field()
-    points = scrapy.Field()
-    x1q_pts = scrapy.Field()
-    x2q_pts = scrapy.Field()
-    x3q_pts = scrapy.Field()
-    x4q_pts = scrapy.Field()
-    ot_pts = scrapy.Field()
-    pace = scrapy.Field()  # Four Factor Table
-    efg_per = scrapy.Field()
-    ft_per_fga = scrapy.Field()  # Four Factor table
-    ts_per = scrapy.Field()
-    x3p_ar = scrapy.Field()
-    ft_ar = scrapy.Field()
-    oreb_per = scrapy.Field()
-    dreb_per = scrapy.Field()
-    reb_per = scrapy.Field()
-    ast_per = scrapy.Field()
-    stl_per = scrapy.Field()
-    blk_per = scrapy.Field()
-    tov_per = scrapy.Field()
-    usg_per = scrapy.Field()
-    off_rating = scrapy.Field()
-    def_rating = scrapy.Field()
+    fgm = scrapy.Field(converter=int)
+    fga = scrapy.Field(converter=int)
+    fg_per = scrapy.Field(converter=float)
+    x3pa = scrapy.Field(converter=int)
+    x3pm = scrapy.Field(converter=int)
+    x3p_per = scrapy.Field(converter=float)
+    fta = scrapy.Field(converter=int)
+    ftm = scrapy.Field(converter=int)
+    ft_per = scrapy.Field(converter=float)
+    orebs = scrapy.Field(converter=int)
+    drebs = scrapy.Field(converter=int)
+    rebounds = scrapy.Field(converter=int)
+    assists = scrapy.Field(converter=int)
+    steals = scrapy.Field(converter=int)
+    blocks = scrapy.Field(converter=int)
+    turnovers = scrapy.Field(converter=int)
+    fouls = scrapy.Field(converter=int)
+    points = scrapy.Field(converter=int)
+    x1q_pts = scrapy.Field(converter=int)
+    x2q_pts = scrapy.Field(converter=int)
+    x3q_pts = scrapy.Field(converter=int)
+    x4q_pts = scrapy.Field(converter=int)
+    ot_pts = scrapy.Field(converter=int)
+    pace = scrapy.Field(converter=float)  # Four Factor Table
+    efg_per = scrapy.Field(converter=float)
+    ft_per_fga = scrapy.Field(converter=float)  # Four Factor table
+    ts_per = scrapy.Field(converter=float)
+    x3p_ar = scrapy.Field(converter=float)
+    ft_ar = scrapy.Field(converter=float)
+    oreb_per = scrapy.Field(converter=float)
+    dreb_per = scrapy.Field(converter=float)
+    reb_per = scrapy.Field(converter=float)
+    ast_per = scrapy.Field(converter=float)
+    stl_per = scrapy.Field(converter=float)
+    blk_per = scrapy.Field(converter=float)
+    tov_per = scrapy.Field(converter=float)
+    usg_per = scrapy.Field(converter=float)
+    off_rating = scrapy.Field(converter=float)
+    def_rating = scrapy.Field(converter=float)
 
 
 class Player(scrapy.Item):
@@ -80,41 +98,41 @@ class Player(scrapy.Item):
 class PlayerStats(scrapy.Item):
     player = scrapy.Field()
     game_id = scrapy.Field()
-    min = scrapy.Field()
-    fgm = scrapy.Field()
-    fga = scrapy.Field()
-    fg_per = scrapy.Field()
-    x3pa = scrapy.Field()
-    x3pm = scrapy.Field()
-    x3p_per = scrapy.Field()
-    fta = scrapy.Field()
-    ftm = scrapy.Field()
-    ft_per = scrapy.Field()
-    orebs = scrapy.Field()
-    drebs = scrapy.Field()
-    rebounds = scrapy.Field()
-    assists = scrapy.Field()
-    steals = scrapy.Field()
-    blocks = scrapy.Field()
-    turnovers = scrapy.Field()
-    fouls = scrapy.Field()
-    plus_minus = scrapy.Field()
-    points = scrapy.Field()
-    ts_per = scrapy.Field()
-    efg_per = scrapy.Field()
-    x3p_ar = scrapy.Field()
-    ft_ar = scrapy.Field()
-    oreb_per = scrapy.Field()
-    dreb_per = scrapy.Field()
-    reb_per = scrapy.Field()
-    ast_per = scrapy.Field()
-    stl_per = scrapy.Field()
-    blk_per = scrapy.Field()
-    tov_per = scrapy.Field()
-    usg_per = scrapy.Field()
-    off_rating = scrapy.Field()
-    def_rating = scrapy.Field()
-    bpm = scrapy.Field()
-    obpm = scrapy.Field()
-    dbpm = scrapy.Field()
-    vorp = scrapy.Field()
+    min = scrapy.Field(converter=float)
+    fgm = scrapy.Field(converter=int)
+    fga = scrapy.Field(converter=int)
+    fg_per = scrapy.Field(converter=float)
+    x3pa = scrapy.Field(converter=int)
+    x3pm = scrapy.Field(converter=int)
+    x3p_per = scrapy.Field(converter=float)
+    fta = scrapy.Field(converter=int)
+    ftm = scrapy.Field(converter=int)
+    ft_per = scrapy.Field(converter=float)
+    orebs = scrapy.Field(converter=int)
+    drebs = scrapy.Field(converter=int)
+    rebounds = scrapy.Field(converter=int)
+    assists = scrapy.Field(converter=int)
+    steals = scrapy.Field(converter=int)
+    blocks = scrapy.Field(converter=int)
+    turnovers = scrapy.Field(converter=int)
+    fouls = scrapy.Field(converter=int)
+    plus_minus = scrapy.Field(converter=int)
+    points = scrapy.Field(converter=int)
+    ts_per = scrapy.Field(converter=float)
+    efg_per = scrapy.Field(converter=float)
+    x3p_ar = scrapy.Field(converter=float)
+    ft_ar = scrapy.Field(converter=float)
+    oreb_per = scrapy.Field(converter=float)
+    dreb_per = scrapy.Field(converter=float)
+    reb_per = scrapy.Field(converter=float)
+    ast_per = scrapy.Field(converter=float)
+    stl_per = scrapy.Field(converter=float)
+    blk_per = scrapy.Field(converter=float)
+    tov_per = scrapy.Field(converter=float)
+    usg_per = scrapy.Field(converter=float)
+    off_rating = scrapy.Field(converter=float)
+    def_rating = scrapy.Field(converter=float)
+    bpm = scrapy.Field(converter=float)
+    obpm = scrapy.Field(converter=float)
+    dbpm = scrapy.Field(converter=float)
+    vorp = scrapy.Field(converter=float)
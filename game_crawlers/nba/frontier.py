@@ -0,0 +1,280 @@
+import json
+import os
+import sqlite3
+import sys
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+
+from game_crawlers.nba.httpcache import url_to_date
+from game_crawlers.nba.middlewares import is_known_game
+from game_crawlers.nba.seasons import season_of
+
+DEFAULT_PATH = os.environ.get("FRONTIER_PATH", ".scrapy/frontier.sqlite")
+
+PENDING = "pending"
+DONE = "done"
+
+
+class CrawlFrontier:
+    """
+    Persistent record of the scoreboard and boxscore urls a crawl has scheduled and finished.
+    Requests are stored as pending when they are scheduled and marked done once their
+    response has been parsed and the requests it led to are stored, so a crawl that is killed
+    can be restarted with exactly the requests it didn't get to.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # backfill workers share the file, wait for each other's writes instead of failing
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS requests (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                season TEXT,
+                date TEXT,
+                callback TEXT,
+                cb_kwargs TEXT,
+                status TEXT NOT NULL,
+                added_at TEXT NOT NULL,
+                done_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS requests_status ON requests (status);
+            """
+        )
+
+    @staticmethod
+    def _row(request: Request, now: str) -> tuple:
+        d = url_to_date(request.url)
+        kind = "boxscore" if request.cb_kwargs.get("game_id") else "scoreboard"
+        callback = request.callback.__name__ if request.callback else None
+        # off season dates and dates outside the calendar have no season
+        season = season_of(d) if d else None
+        return (
+            request.url,
+            kind,
+            season.season if season else None,
+            d.isoformat() if d else None,
+            callback,
+            json.dumps(request.cb_kwargs),
+            PENDING,
+            now,
+        )
+
+    def add(self, requests: Iterable[Request]):
+        # stores requests as pending, urls already known keep their status
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO requests (url, kind, season, date, callback, cb_kwargs,"
+                " status, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._row(r, now) for r in requests],
+            )
+
+    def finish(self, url: str, requests: Iterable[Request] = ()):
+        # marks a url done and stores the requests its response led to in the same transaction
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO requests (url, kind, season, date, callback, cb_kwargs,"
+                " status, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._row(r, now) for r in requests],
+            )
+            self.conn.execute(
+                "UPDATE requests SET status = ?, done_at = ? WHERE url = ?", (DONE, now, url)
+            )
+
+    def is_done(self, url: str) -> bool:
+        row = self.conn.execute("SELECT status FROM requests WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] == DONE
+
+    def pending(self, kind: Optional[str] = None) -> List[tuple]:
+        # (url, date, callback, cb_kwargs) of requests that were scheduled but never finished
+        query = "SELECT url, date, callback, cb_kwargs FROM requests WHERE status = ?"
+        params = [PENDING]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        return self.conn.execute(query + " ORDER BY date, url", params).fetchall()
+
+    def lost(self, stored: set) -> List[tuple]:
+        # (url, date) of boxscores marked done whose game isn't stored. They are marked done
+        # when parsed, but the database pipeline writes in batches, so games can be lost with
+        # an unflushed batch
+        return [
+            (url, d)
+            for url, d, cb_kwargs in self.conn.execute(
+                "SELECT url, date, cb_kwargs FROM requests"
+                " WHERE kind = 'boxscore' AND status = ?",
+                (DONE,),
+            )
+            if json.loads(cb_kwargs).get("game_id") not in stored
+        ]
+
+    def requeue(self, urls: Iterable[str]) -> int:
+        # puts done urls back to pending
+        rows = [(PENDING, url) for url in urls]
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE requests SET status = ?, done_at = NULL WHERE url = ?", rows
+            )
+        return len(rows)
+
+    def status(self) -> Dict[str, Dict[str, List[int]]]:
+        # {season: {kind: [done, total]}} in season order
+        seasons = OrderedDict()
+        for season, kind, done, total in self.conn.execute(
+            """
+            SELECT season, kind, SUM(status = 'done'), COUNT(*) FROM requests
+            GROUP BY season, kind ORDER BY MIN(date), kind DESC
+            """
+        ):
+            seasons.setdefault(season or "unknown", {})[kind] = [done, total]
+        return seasons
+
+    def close(self):
+        self.conn.close()
+
+
+class CrawlFrontierMiddleware(object):
+    """
+    Spider middleware that keeps a CrawlFrontier up to date. Start requests that are already
+    done are dropped, boxscores that were scheduled by an earlier run but never parsed are
+    requested again when their date is crawled, and every parsed response is marked done
+    together with the requests it produced. Scoreboards of days that weren't over yet when
+    they were fetched stay pending.
+
+    With FRONTIER_CHECK_STORED set, boxscores whose game never made it into the games table
+    are requeued. They are looked up when the spider opens, before this crawl writes anything,
+    and only requeued for the dates of its own start requests, so games that other backfill
+    workers sharing the frontier still hold in unflushed batches are left alone.
+
+    Resumed requests are yielded after KnownGameFilterMiddleware has seen the start requests,
+    so with SKIP_KNOWN_GAMES set they go through the same known game check here, and those
+    for stored games are marked done instead.
+
+    Enabled with FRONTIER_ENABLED. The frontier is kept at FRONTIER_PATH, or inside JOBDIR when
+    that is set, next to scrapy's own request queue and seen requests; scrapy's dupefilter then
+    drops resumed requests that its queue already restored.
+    """
+
+    def __init__(
+        self, path: str, stats, check_stored: bool = False, skip_known: bool = False
+    ):
+        self.path = path
+        self.stats = stats
+        self.check_stored = check_stored
+        self.skip_known = skip_known
+        self.frontier = None
+        self.lost = list()
+        self.known = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("FRONTIER_ENABLED"):
+            raise NotConfigured
+        jobdir = crawler.settings.get("JOBDIR")
+        path = crawler.settings.get("FRONTIER_PATH") or (
+            os.path.join(jobdir, "frontier.sqlite") if jobdir else DEFAULT_PATH
+        )
+        o = cls(
+            path,
+            crawler.stats,
+            check_stored=crawler.settings.getbool("FRONTIER_CHECK_STORED"),
+            skip_known=crawler.settings.getbool("SKIP_KNOWN_GAMES"),
+        )
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_opened(self, spider):
+        self.frontier = CrawlFrontier(self.path)
+        if self.check_stored or self.skip_known:
+            from db import nba
+
+            db = nba.nbaDB(os.environ["dbName"], os.environ["dbPass"])
+            stored = db.game_ids()
+            db.close()
+            if self.check_stored:
+                self.lost = self.frontier.lost(stored)
+            if self.skip_known:
+                self.known = stored
+
+    def spider_closed(self, spider):
+        self.frontier.close()
+
+    def process_start_requests(self, start_requests, spider):
+        # pending boxscores are only resumed for the dates this crawl covers, backfill workers
+        # share one frontier and each resumes the games of its own shard
+        dates = set()
+        for r in start_requests:
+            d = url_to_date(r.url)
+            if d is not None:
+                dates.add(d.isoformat())
+            if self.frontier.is_done(r.url):
+                self.stats.inc_value("frontier/skipped", spider=spider)
+                continue
+            self.frontier.add([r])
+            yield r
+        if self.check_stored:
+            requeued = self.frontier.requeue(url for url, d in self.lost if d in dates)
+            self.stats.set_value("frontier/requeued", requeued, spider=spider)
+        for url, d, callback, cb_kwargs in self.frontier.pending("boxscore"):
+            if d not in dates:
+                continue
+            request = Request(
+                url=url,
+                callback=getattr(spider, callback),
+                cb_kwargs=json.loads(cb_kwargs),
+            )
+            if self.skip_known and is_known_game(request, self.known):
+                self.frontier.finish(url)
+                self.stats.inc_value("known_games/skipped", spider=spider)
+                continue
+            self.stats.inc_value("frontier/resumed", spider=spider)
+            yield request
+
+    def process_spider_output(self, response, result, spider):
+        requests = list()
+        for r in result:
+            if isinstance(r, Request):
+                requests.append(r)
+            yield r
+        # only reached once the callback is exhausted, so a response that failed half way
+        # through parsing stays pending. The frontier stores the url that was requested,
+        # which is the first of the redirect chain when the site redirected it
+        url = response.request.meta.get("redirect_urls", [response.url])[0]
+        if self._settled(url):
+            self.frontier.finish(url, requests)
+            self.stats.inc_value("frontier/done", spider=spider)
+        else:
+            self.frontier.add(requests)
+
+    @staticmethod
+    def _settled(url: str) -> bool:
+        d = url_to_date(url)
+        return d is None or d < date.today()
+
+
+def print_status(frontier: CrawlFrontier):
+    print(f"{'season':<8} {'scoreboards':>18} {'boxscores':>18}")
+    for season, kinds in frontier.status().items():
+        cells = list()
+        for kind in ("scoreboard", "boxscore"):
+            done, total = kinds.get(kind, [0, 0])
+            cells.append(f"{done}/{total} {100 * done / total if total else 0:5.1f}%")
+        print(f"{season:<8} {cells[0]:>18} {cells[1]:>18}")
+
+
+if __name__ == "__main__":
+    # python -m game_crawlers.nba.frontier [path]
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    frontier = CrawlFrontier(path)
+    print_status(frontier)
+    frontier.close()
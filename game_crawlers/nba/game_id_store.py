@@ -0,0 +1,203 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple
+
+from game_crawlers.nba.seasons import season_of, to_date
+
+DEFAULT_PATH = os.environ.get("GAME_ID_STORE_PATH", "/mnt/game_ids/game_ids.sqlite")
+
+# game_ids_<year><month><day>.json as GameDriver used to write them, month and day unpadded
+LEGACY_FILE_RE = re.compile(r"game_ids_(?P<year>[0-9]{4})(?P<rest>[0-9]{2,4})\.json$")
+# ESPN ids before the 400000000 range encode the day: 271030001 is game 1 of 2007-10-30
+LEGACY_ID_RE = re.compile(r"^[23][0-9](?P<month>[0-9]{2})(?P<day>[0-9]{2})[0-9]{3}$")
+
+
+class GameIdStore:
+    """
+    ESPN game ids by day in one sqlite file, replacing the json file per day under
+    /mnt/game_ids. Every fetched day is recorded with its season and phase, also days
+    without games, so discovery can skip the days it already has and NBAESPNSpider can be
+    given the games of any window with one indexed query. Safe to share between the threads
+    of ScoreboardFetcher and GameDriverPool.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS days (
+                date TEXT PRIMARY KEY,
+                season TEXT,
+                phase TEXT,
+                game_count INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS games (
+                game_id TEXT PRIMARY KEY,
+                date TEXT NOT NULL,
+                season TEXT,
+                phase TEXT
+            );
+            CREATE INDEX IF NOT EXISTS games_date ON games (date);
+            CREATE INDEX IF NOT EXISTS games_season ON games (season, phase);
+            """
+        )
+
+    def upsert(self, d: date, game_ids: List[str], fetched_at: datetime = None):
+        # replaces the games stored for a day, so a rescheduled game moves with it
+        d = to_date(d)
+        season = season_of(d)
+        key = (
+            d.isoformat(),
+            season.season if season else None,
+            season.phase if season else None,
+        )
+        fetched_at = fetched_at or datetime.now()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM games WHERE date = ?", (key[0],))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?)",
+                [(str(g),) + key for g in game_ids],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?, ?)",
+                key + (len(game_ids), fetched_at.isoformat()),
+            )
+
+    @staticmethod
+    def _where(
+        start: Optional[date],
+        end: Optional[date],
+        seasons: Optional[Iterable[str]],
+        phases: Optional[Iterable[str]],
+    ) -> Tuple[str, list]:
+        clauses, params = ["1 = 1"], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(to_date(start).isoformat())
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(to_date(end).isoformat())
+        for column, values in (("season", seasons), ("phase", phases)):
+            if values:
+                values = list(values)
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return " AND ".join(clauses), params
+
+    def game_ids(
+        self,
+        start: date = None,
+        end: date = None,
+        seasons: Iterable[str] = None,
+        phases: Iterable[str] = None,
+    ) -> List[str]:
+        # game ids of the days from start to end inclusive, in date order
+        where, params = self._where(start, end, seasons, phases)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT game_id FROM games WHERE {where} ORDER BY date, game_id", params
+            ).fetchall()
+        return [g for g, in rows]
+
+    def settled_dates(
+        self,
+        start: date = None,
+        end: date = None,
+        seasons: Iterable[str] = None,
+        phases: Iterable[str] = None,
+    ) -> set:
+        # days fetched after they were over, with or without games, which discovery can skip
+        where, params = self._where(start, end, seasons, phases)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT date FROM days WHERE {where} AND substr(fetched_at, 1, 10) > date",
+                params,
+            ).fetchall()
+        return {date.fromisoformat(d) for d, in rows}
+
+    def import_json(self, path: str) -> Tuple[int, List[str]]:
+        # loads the json files GameDriver wrote under path. Their names don't pad the month
+        # and day, so game_ids_2019111.json may be January 11th or November 1st; those are
+        # resolved with the day encoded in older game ids, or by being the only candidate in
+        # a season. Returns the days imported and the files that couldn't be placed.
+        imported, unresolved = 0, []
+        for f in sorted(glob.glob(os.path.join(path, "game_ids_*.json"))):
+            with open(f) as fh:
+                games = [str(g) for g in json.load(fh)]
+            d = legacy_file_date(os.path.basename(f), games)
+            if d is None:
+                unresolved.append(f)
+                continue
+            mtime = datetime.fromtimestamp(os.path.getmtime(f))
+            self.upsert(d, games, fetched_at=mtime)
+            imported += 1
+        return imported, unresolved
+
+    def summary(self) -> List[tuple]:
+        # (season, phase, days, games) in season order
+        with self.lock:
+            return self.conn.execute(
+                """
+                SELECT season, phase, COUNT(*), SUM(game_count) FROM days
+                GROUP BY season, phase ORDER BY MIN(date)
+                """
+            ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def legacy_file_date(name: str, games: List[str]) -> Optional[date]:
+    match = LEGACY_FILE_RE.search(name)
+    if match is None:
+        return None
+    year, rest = int(match.group("year")), match.group("rest")
+    splits = {(rest[:1], rest[1:]), (rest[:2], rest[2:])}
+    candidates = set()
+    for month, day in splits:
+        if not day or month.startswith("0") or day.startswith("0"):
+            continue
+        try:
+            candidates.add(date(year, int(month), int(day)))
+        except ValueError:
+            continue
+    if len(candidates) > 1:
+        for g in games:
+            encoded = LEGACY_ID_RE.match(g)
+            if encoded:
+                month, day = int(encoded.group("month")), int(encoded.group("day"))
+                candidates = {c for c in candidates if (c.month, c.day) == (month, day)}
+                break
+    if len(candidates) > 1:
+        candidates = {c for c in candidates if season_of(c) is not None}
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+if __name__ == "__main__":
+    # python -m game_crawlers.nba.game_id_store import /mnt/game_ids
+    # python -m game_crawlers.nba.game_id_store summary
+    parser = argparse.ArgumentParser(description="ESPN game id store")
+    parser.add_argument("command", choices=["import", "summary"])
+    parser.add_argument("json_dir", nargs="?", default="/mnt/game_ids")
+    parser.add_argument("--store", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    store = GameIdStore(args.store)
+    if args.command == "import":
+        imported, unresolved = store.import_json(args.json_dir)
+        print(f"imported {imported} days from {args.json_dir}")
+        for f in unresolved:
+            print(f"could not tell which day {f} is, skipped")
+    for season, phase, days, games in store.summary():
+        print(f"{season or 'unknown':<8} {phase or '':<15} {days:>4} days {games:>5} games")
+    store.close()
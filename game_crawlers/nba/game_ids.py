@@ -1,103 +1,194 @@
 from selenium import webdriver
-from selenium.webdriver import DesiredCapabilities, FirefoxProfile
 from selenium.webdriver.firefox.options import Options
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List, Optional
 from itertools import chain
+import argparse
+import queue
 import re
-import os
-import json
-from calendar import monthrange
-from datetime import datetime
+import threading
 
-from nba_seasons import Seasons
+from game_crawlers.nba.espn_ids import season_dates
+from game_crawlers.nba.game_id_store import DEFAULT_PATH, GameIdStore
+from game_crawlers.nba.seasons import Seasons
+from game_crawlers.nba.throttle import RateLimiter
 
 
 """
 GameDriver is a class that uses selenium webdrivers to get a list of
-games from ESPN given a range of dates.
+games from ESPN given a range of dates. espn_ids.ScoreboardFetcher does the
+same with plain http requests, without a browser. Both store the ids in a GameIdStore.
 """
 
 
 class GameDriver:
-    def __init__(self, url, options):
+    def __init__(self, url, options, page_timeout: int = 30):
         self.driver = webdriver.Firefox(options=options)
-        self.driver.set_page_load_timeout(30)
+        self.driver.set_page_load_timeout(page_timeout)
         self.base_url = url
-
-    def get_games_daterange(self, start: datetime, end: datetime) -> List[str]:
-        if start > end:
-            raise ValueError("start date cannot be later than end date")
-        d = self._get_dates(start, end)
-        for date in d:
-            print(f"getting game urls for {date}")
-            games = self._get_games_url(date)
-            self.write_to_file(games, date)
+        self.pages = 0
 
     def _date_to_url(self, d: datetime) -> str:
         return f"{self.base_url}{d.year}{d.month :02d}{d.day :02d}"
 
-    def _get_games_url(self, date: str) -> List[str]:
-        retry = 0
-        t = datetime.now()
-        u = self._date_to_url(date)
-        while retry < 3:
-            try:
-                self.driver.get(u)
-                retry = 3
-            except TimeoutException:
-                print("timed out, retrying")
-                retry += 1
-            except Exception as e:
-                print(e)
-                retry = 3
+    def games_on(self, date: datetime) -> List[str]:
+        # loads a day once, timeouts and browser crashes are raised to the caller
+        self.pages += 1
+        self.driver.get(self._date_to_url(date))
+        return self._game_ids_on_page()
 
+    def _game_ids_on_page(self) -> List[str]:
         l = self.driver.find_elements_by_xpath('//a[@class="mobileScoreboardLink"]')
         out = [re.findall(r"gameId=([0-9]+)", i.get_attribute("href")) for i in l]
-        print(
-            f"found {len(out)} games on {date} - call took {(datetime.now() - t).seconds} seconds"
-        )
         return list(chain.from_iterable(out))
 
+    def close(self):
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
+
     @staticmethod
     def _get_dates(start: datetime, end: datetime) -> List[datetime]:
         d = (end + timedelta(days=1) - start).days
         return [start + timedelta(days=i) for i in range(d)]
 
-    @staticmethod
-    def _dt_to_str(date: datetime) -> str:
-        return f"game_ids_{date.year}{date.month}{date.day}"
 
-    def write_to_file(self, games: dict, date: datetime):
-        if not os.path.exists("/mnt/game_ids"):
-            os.makedirs("/mnt/game_ids")
-        with open(
-            os.path.join("/mnt/game_ids", f"{self._dt_to_str(date)}.json"), "w"
-        ) as f:
-            json.dump(games, f)
-        print(f"wrote game ids for {date} to file")
+class GameDriverPool:
+    """
+    Runs `size` GameDrivers on their own threads, taking days from a shared queue. Page loads
+    are capped at `rate` per second across all drivers. A day that times out, or whose
+    browser fails to start, is put back on the queue up to `retries` times, and the driver
+    that timed out or crashed is replaced with a fresh browser. Drivers are also replaced
+    after `recycle_after` pages, since Firefox keeps growing the longer it runs. Days that
+    never got a result are reported as failed.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        options,
+        size: int = 4,
+        recycle_after: int = 50,
+        rate: float = 1.0,
+        page_timeout: int = 30,
+        retries: int = 3,
+        store: GameIdStore = None,
+    ):
+        self.url = url
+        self.options = options
+        self.size = size
+        self.recycle_after = recycle_after
+        self.page_timeout = page_timeout
+        self.retries = retries
+        self.limiter = RateLimiter(rate)
+        self.store = store if store is not None else GameIdStore()
+        self.results: Dict[datetime, Optional[List[str]]] = dict()
+        self.lock = threading.Lock()
+
+    def _new_driver(self) -> GameDriver:
+        return GameDriver(self.url, self.options, self.page_timeout)
+
+    def _work(self, dates: queue.Queue):
+        driver = None
+        try:
+            while True:
+                try:
+                    date, attempt = dates.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if driver is None or driver.pages >= self.recycle_after:
+                        if driver is not None:
+                            driver.close()
+                            driver = None
+                        driver = self._new_driver()
+                    self.limiter.wait()
+                    games = driver.games_on(date)
+                except WebDriverException as e:
+                    # TimeoutException included, the browser may be stuck on the page or may
+                    # not have started at all
+                    if driver is not None:
+                        driver.close()
+                        driver = None
+                    if attempt + 1 < self.retries:
+                        print(f"failed to load {date:%Y-%m-%d}, retrying: {e}")
+                        dates.put((date, attempt + 1))
+                    else:
+                        print(f"failed to get game ids for {date:%Y-%m-%d}: {e}")
+                        with self.lock:
+                            self.results[date] = None
+                    continue
+                self.store.upsert(date, games)
+                print(f"found {len(games)} games on {date:%Y-%m-%d}")
+                with self.lock:
+                    self.results[date] = games
+        finally:
+            if driver is not None:
+                driver.close()
+
+    def get_games_dates(self, dates: List[datetime]) -> Dict[datetime, Optional[List[str]]]:
+        # fetches and writes every day, returns {day: game ids or None if it failed}
+        work = queue.Queue()
+        for d in dates:
+            work.put((d, 0))
+        self.results = dict()
+        threads = [
+            threading.Thread(target=self._work, args=(work,), name=f"game-driver-{i}")
+            for i in range(min(self.size, len(dates)))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # days a worker took off the queue but never finished, e.g. when its thread died on
+        # an unexpected error, count as failed
+        for d in dates:
+            self.results.setdefault(d, None)
+        return self.results
+
+    def get_games_daterange(
+        self, start: datetime, end: datetime
+    ) -> Dict[datetime, Optional[List[str]]]:
+        if start > end:
+            raise ValueError("start date cannot be later than end date")
+        return self.get_games_dates(GameDriver._get_dates(start, end))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="find ESPN game ids with headless Firefox")
+    parser.add_argument("--season", action="append", choices=list(Seasons.season_info))
+    parser.add_argument("--drivers", type=int, default=4, help="browsers to run at once")
+    parser.add_argument("--recycle-after", type=int, default=50, help="pages per browser")
+    parser.add_argument("--rate", type=float, default=1.0, help="page loads per second")
+    parser.add_argument("--store", default=DEFAULT_PATH)
+    parser.add_argument("--refetch", action="store_true", help="fetch days already stored")
+    args = parser.parse_args()
 
     options = Options()
     options.headless = True
     u = "https://www.espn.com/nba/scoreboard/_/date/"
-    g_driver = GameDriver(u, options)
-    for k in Seasons.season_info.keys():
-        try:
-            g_driver.get_games_daterange(
-                Seasons.season_info[k].get("regular_season_start"),
-                Seasons.season_info[k].get("regular_season_end"),
-            )
-            g_driver.get_games_daterange(
-                Seasons.season_info[k].get("post_season_start"),
-                Seasons.season_info[k].get("post_season_end"),
-            )
-        except Exception as e:
-            print(e)
-            print(f"failed to get game_ids for season {k}")
-    g_driver.driver.close()
-
-    print("wrote game ids to file")
+    store = GameIdStore(args.store)
+    pool = GameDriverPool(
+        u,
+        options,
+        size=args.drivers,
+        recycle_after=args.recycle_after,
+        rate=args.rate,
+        store=store,
+    )
+    settled = set() if args.refetch else store.settled_dates(seasons=args.season)
+    t = datetime.now()
+    results = pool.get_games_dates(
+        [d for d in season_dates(args.season) if d.date() not in settled]
+    )
+    failed = sorted(d for d, games in results.items() if games is None)
+    for d in failed:
+        print(f"failed to get game_ids for {d:%Y-%m-%d}")
+
+    print(
+        f"stored game ids for {len(results) - len(failed)} days in "
+        f"{(datetime.now() - t).seconds} seconds"
+    )
+    store.close()
@@ -0,0 +1,113 @@
+import os
+import re
+from datetime import date, datetime
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+import pytz
+from scrapy.extensions.httpcache import RFC2616Policy, rfc1123_to_epoch
+
+from game_crawlers.nba.seasons import calendar, season_of
+
+BOXSCORE_DATE_REGEX = re.compile(
+    r"boxscores/(?P<year>[0-9]{4})(?P<month>[0-9]{2})(?P<day>[0-9]{2})"
+)
+# season pages are named by the year the season ends in (/leagues/NBA_2006_games.html)
+SEASON_PAGE_REGEX = re.compile(r"/leagues/NBA_(?P<year>[0-9]{4})")
+US_EASTERN = pytz.timezone("US/Eastern")
+
+# settings that turn on the on-disk response cache. Responses are stored gzipped under
+# HTTPCACHE_DIR by scrapy's filesystem storage, one directory per request fingerprint
+# (a hash of the url), and SeasonCachePolicy decides when a stored copy can be reused.
+HTTPCACHE_SETTINGS = {
+    "HTTPCACHE_ENABLED": True,
+    "HTTPCACHE_POLICY": "game_crawlers.nba.httpcache.SeasonCachePolicy",
+    "HTTPCACHE_STORAGE": "scrapy.extensions.httpcache.FilesystemCacheStorage",
+    "HTTPCACHE_DIR": os.environ.get("HTTPCACHE_DIR", "httpcache"),
+    "HTTPCACHE_GZIP": True,
+    "HTTPCACHE_EXPIRATION_SECS": 0,
+    "HTTPCACHE_IGNORE_HTTP_CODES": [429, 500, 502, 503, 504],
+}
+
+
+def url_to_date(url: str) -> Optional[date]:
+    # boxscore urls carry the date in the game id (/boxscores/200601030NJN.html) and
+    # scoreboard urls carry it in the query string (?month=1&day=3&year=2006)
+    match = BOXSCORE_DATE_REGEX.search(url)
+    if match:
+        return date(
+            int(match.group("year")), int(match.group("month")), int(match.group("day"))
+        )
+    query = parse_qs(urlparse(url).query)
+    try:
+        return date(int(query["year"][0]), int(query["month"][0]), int(query["day"][0]))
+    except (KeyError, ValueError):
+        return None
+
+
+def page_last_day(url: str) -> Optional[date]:
+    # the last day whose games a page can show: its own date for scoreboards and boxscores,
+    # the end of the post season for season pages
+    d = url_to_date(url)
+    if d is not None:
+        return d
+    match = SEASON_PAGE_REGEX.search(url)
+    if match is None:
+        return None
+    year = int(match.group("year"))
+    return calendar.season_end(f"{(year - 1) % 100:02d}-{year % 100:02d}")
+
+
+def season_finished(d: date, today: Optional[date] = None) -> bool:
+    today = today or datetime.now().date()
+    season = season_of(d)
+    return season is not None and calendar.season_end(season.season) < today
+
+
+class SeasonCachePolicy(RFC2616Policy):
+    """
+    Cache policy for basketball-reference pages. Scoreboards and boxscores from seasons that
+    have already finished never change, so they are stored unconditionally and served from
+    the cache without touching the network, provided the copy was fetched after the last day
+    the page covers (by its Date header); a copy fetched while those games were still to be
+    played is revalidated like any other. Everything else follows RFC2616: stale copies are
+    revalidated with If-None-Match / If-Modified-Since and reused when the site answers 304.
+    Responses with a status in HTTPCACHE_IGNORE_HTTP_CODES are never stored, which scrapy
+    only does for its DummyPolicy, so a rate limited or failed page is fetched again.
+    """
+
+    def __init__(self, settings):
+        super(SeasonCachePolicy, self).__init__(settings)
+        self.ignore_http_codes = {
+            int(x) for x in settings.getlist("HTTPCACHE_IGNORE_HTTP_CODES")
+        }
+
+    def should_cache_response(self, response, request):
+        if response.status in self.ignore_http_codes:
+            return False
+        if response.status == 200 and self._is_final(request):
+            return True
+        return super(SeasonCachePolicy, self).should_cache_response(response, request)
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if self._is_final(request) and self._fetched_after(cachedresponse, request):
+            return True
+        return super(SeasonCachePolicy, self).is_cached_response_fresh(
+            cachedresponse, request
+        )
+
+    @staticmethod
+    def _is_final(request) -> bool:
+        d = page_last_day(request.url)
+        return d is not None and season_finished(d)
+
+    @staticmethod
+    def _fetched_after(cachedresponse, request) -> bool:
+        # the stored Date header is when the site served the copy, compared in US time like
+        # the game dates. Copies without one are never taken as final.
+        header = cachedresponse.headers.get(b"Date")
+        epoch = rfc1123_to_epoch(header) if header else None
+        if epoch is None:
+            return False
+        fetched = datetime.fromtimestamp(epoch, pytz.utc).astimezone(US_EASTERN).date()
+        return fetched > page_last_day(request.url)
@@ -0,0 +1,50 @@
+import os
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+
+from db import nba
+
+
+class KnownGameFilterMiddleware(object):
+    """
+    Spider middleware that drops boxscore requests for games already stored in the games table,
+    so resumed backfills and repeated daily runs never download a boxscore twice. The stored
+    game ids are loaded once when the spider opens. Enabled with SKIP_KNOWN_GAMES, and a request
+    can opt out with meta={"force": True}.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.known = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("SKIP_KNOWN_GAMES"):
+            raise NotConfigured
+        o = cls(crawler.stats)
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        return o
+
+    def spider_opened(self, spider):
+        db = nba.nbaDB(os.environ["dbName"], os.environ["dbPass"])
+        # a set of ~40k short strings is only a few MB, small enough that a bloom filter
+        # isn't worth the false positives.
+        self.known = db.game_ids()
+        db.close()
+        spider.logger.info(f"loaded {len(self.known)} stored game ids")
+
+    def process_spider_output(self, response, result, spider):
+        for r in result:
+            if isinstance(r, Request) and self.is_known(r):
+                self.stats.inc_value("known_games/skipped", spider=spider)
+                continue
+            yield r
+
+    def is_known(self, request: Request) -> bool:
+        return is_known_game(request, self.known)
+
+
+def is_known_game(request: Request, known: set) -> bool:
+    # a boxscore request for a stored game, unless it opted out with meta={"force": True}
+    game_id = request.cb_kwargs.get("game_id")
+    return game_id in known and not request.meta.get("force", False)
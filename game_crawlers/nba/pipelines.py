@@ -1,37 +1,260 @@
 import json
-import scrapy
+import threading
+import time
+from twisted.internet.defer import Deferred, DeferredList, DeferredSemaphore
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 from db import nba
 import os
 
 # TODO add SQL Pipeline instead
 
-USER = os.environ["dbName"]
-PASSWORD = os.environ["dbPass"]
-
 
 class DBWriterPipeline(object):
+    """
+    Writes boxscore items to postgres. By default every item is added and committed on its own,
+    setting DB_BATCH_SIZE buffers items and flushes them as multi-row upserts once DB_BATCH_SIZE
+    items have been collected, or DB_BATCH_SECONDS seconds after the first item of the batch
+    arrived, whether or not more items come in. With DB_WRITE_MODE set
+    to "copy" batches are bulk loaded through COPY and staging tables instead, which is meant
+    for backfills.
+
+    With DB_WRITE_THREADS set, writes run on a pool of that many threads, each with its own
+    nbaDB, and process_item returns a Deferred so the reactor keeps downloading and parsing
+    while postgres commits. At most DB_MAX_PENDING_WRITES writes are queued or running, past
+    that the items' Deferreds wait for a slot, which holds up the scraper and in turn new
+    downloads. Without it writes block the reactor thread.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 0,
+        batch_seconds: float = 0,
+        write_mode: str = "upsert",
+        write_threads: int = 0,
+        max_pending: int = 4,
+        stats=None,
+    ):
+        if write_mode not in ("upsert", "copy"):
+            raise ValueError(f"unknown DB_WRITE_MODE {write_mode!r}")
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.write_mode = write_mode
+        self.write_threads = write_threads
+        self.max_pending = max(1, max_pending)
+        self.stats = stats
+        self.buffer = []
+        self.buffer_started = time.monotonic()
+        self.flush_call = None
+        self.pending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("DB_BATCH_SIZE", 0),
+            batch_seconds=crawler.settings.getfloat("DB_BATCH_SECONDS", 0),
+            write_mode=crawler.settings.get("DB_WRITE_MODE", "upsert"),
+            write_threads=crawler.settings.getint("DB_WRITE_THREADS", 0),
+            max_pending=crawler.settings.getint("DB_MAX_PENDING_WRITES", 4),
+            stats=crawler.stats,
+        )
+
     def open_spider(self, spider):
-        self.db = nba.nbaDB(USER, PASSWORD)
+        # credentials are read here rather than at import so the json pipeline can be
+        # used without a database configured.
+        self.db = self._new_db()
+        self.db.preload_dimensions()
+        self.dbs = [self.db]
+        from twisted.internet import reactor
+
+        self.reactor = reactor
+        if self.write_threads:
+            self.local = threading.local()
+            self.semaphore = DeferredSemaphore(self.max_pending)
+            self.threadpool = ThreadPool(
+                minthreads=1, maxthreads=self.write_threads, name="db-writer"
+            )
+            self.threadpool.start()
+
+    @staticmethod
+    def _new_db():
+        return nba.nbaDB(os.environ["dbName"], os.environ["dbPass"])
 
     def close_spider(self, spider):
-        self.db.session.commit()
-        self.db.session.close()
+        self._cancel_timed_flush()
+        if self.buffer:
+            d = self.flush(spider)
+            if d is not None:
+                d.addErrback(lambda failure: None)
+        if not self.write_threads:
+            self._close(spider)
+            return None
+        # waits for the queued writes before the connections and threads go away
+        d = DeferredList(list(self.pending))
+        d.addBoth(lambda _: self._close(spider))
+        return d
+
+    def _close(self, spider):
+        for db in self.dbs:
+            db.commit()
+            db.close()
+        if self.write_threads:
+            self.threadpool.stop()
+        cache = self.db.dimensions
+        spider.logger.info(
+            f"dimension cache: {cache.hits} hits, {cache.misses} misses"
+        )
+        if self.stats is not None:
+            self.stats.set_value("db/dimension_cache_hits", cache.hits)
+            self.stats.set_value("db/dimension_cache_misses", cache.misses)
 
     def process_item(self, item, spider):
         gid = item.get("game_data").get("game_id")
-        self.db.add_record(item)
-        self.db.session.commit()
-        return f"game{gid} processed"
+        if not self.batch_size:
+            if self.write_threads:
+                d = self._in_thread(self._write_record, item)
+                d.addCallback(lambda _: f"game{gid} processed")
+                return d
+            self._write_record(item)
+            return f"game{gid} processed"
+
+        if not self.buffer:
+            self.buffer_started = time.monotonic()
+            if self.batch_seconds:
+                # bounds how long a partial batch waits when items stop coming in
+                self.flush_call = self.reactor.callLater(
+                    self.batch_seconds, self._timed_flush, spider
+                )
+        self.buffer.append(item)
+        waited = time.monotonic() - self.buffer_started
+        if len(self.buffer) >= self.batch_size or (
+            self.batch_seconds and waited >= self.batch_seconds
+        ):
+            d = self.flush(spider)
+            if d is not None:
+                # the item that filled the batch waits for its write, which is what slows
+                # the crawl down when postgres falls behind
+                d.addCallback(lambda _: f"game{gid} queued")
+                return d
+        return f"game{gid} queued"
+
+    def flush(self, spider):
+        # writes the buffered items, returns a Deferred when writes run on threads
+        self._cancel_timed_flush()
+        items, self.buffer = self.buffer, []
+        if self.write_threads:
+            d = self._in_thread(self._write_batch, items)
+            d.addCallbacks(
+                lambda result: self._flushed(spider, len(items), *result),
+                lambda failure: self._flush_failed(spider, len(items), failure),
+            )
+            return d
+        try:
+            rows, elapsed = self._write_batch(items)
+        except Exception:
+            self._flush_failed(spider, len(items))
+            raise
+        self._flushed(spider, len(items), rows, elapsed)
+        return None
+
+    def _timed_flush(self, spider):
+        self.flush_call = None
+        if not self.buffer:
+            return
+        try:
+            d = self.flush(spider)
+        except Exception:
+            # already logged by _flush_failed, there is no item to fail here
+            return
+        if d is not None:
+            d.addErrback(lambda failure: None)
+
+    def _cancel_timed_flush(self):
+        if self.flush_call is not None and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+
+    def _in_thread(self, fn, *args) -> Deferred:
+        # runs fn on the writer pool once one of the max_pending slots is free
+        d = self.semaphore.run(
+            deferToThreadPool, self.reactor, self.threadpool, fn, *args
+        )
+        self.pending.add(d)
+        d.addBoth(self._done, d)
+        return d
+
+    def _done(self, result, d: Deferred):
+        self.pending.discard(d)
+        return result
+
+    def _thread_db(self):
+        # nbaDB sessions are not thread safe, every writer thread gets its own
+        if not self.write_threads:
+            return self.db
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = self._new_db()
+            self.dbs.append(db)
+        return db
+
+    def _write_record(self, item):
+        db = self._thread_db()
+        try:
+            db.add_record(item)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def _write_batch(self, items):
+        db = self._thread_db()
+        start = time.monotonic()
+        try:
+            if self.write_mode == "copy":
+                rows = db.copy_records(items)
+            else:
+                rows = db.add_records(items)
+        except Exception:
+            db.rollback()
+            raise
+        return rows, time.monotonic() - start
+
+    @staticmethod
+    def _flush_failed(spider, games: int, failure=None):
+        spider.logger.error(f"failed to flush {games} games to the database")
+        return failure
+
+    def _flushed(self, spider, games: int, rows: int, elapsed: float):
+        rate = rows / elapsed if elapsed else 0
+        spider.logger.info(
+            f"flushed {games} games ({rows} rows) in {elapsed:.3f}s - {rate:.0f} rows/sec"
+        )
+        if self.stats is not None:
+            self.stats.inc_value("db/flush_count")
+            self.stats.inc_value("db/games_written", games)
+            self.stats.inc_value("db/rows_written", rows)
+            self.stats.inc_value("db/flush_seconds", elapsed)
+            self.stats.max_value("db/flush_seconds_max", elapsed)
+            total_seconds = self.stats.get_value("db/flush_seconds")
+            if total_seconds:
+                self.stats.set_value(
+                    "db/rows_per_sec",
+                    self.stats.get_value("db/rows_written") / total_seconds,
+                )
 
 
 class JsonWriterPipeline(object):
+    def __init__(self, path: str = "items.json"):
+        self.path = path
+
     def open_spider(self, spider):
-        self.file = open("items.json", "w")
+        self.file = open(self.path, "w")
 
     def close_spider(self, spider):
         self.file.close()
 
     def process_item(self, item, spider):
-        line = json.dumps(dict(item)) + "\n"
+        # game dates are datetime.date, written as iso strings
+        line = json.dumps(dict(item), default=str) + "\n"
         self.file.write(line)
         return item
@@ -0,0 +1,101 @@
+import csv
+import os
+import sqlite3
+import sys
+from datetime import date, datetime
+from typing import List, Optional, Set
+
+DEFAULT_PATH = os.environ.get("SCHEDULE_INDEX_PATH", ".scrapy/schedule.sqlite")
+
+
+class ScheduleIndex:
+    """
+    Persistent index of basketball-reference scoreboard results. Every scoreboard the spider
+    parses records its date along with the game ids linked from it, an empty list marks a day
+    without games (All-Star break, gaps between playoff series). A date is only treated as
+    settled once it was fetched after the day was over, so scoreboards pulled before tip-off
+    get requested again.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # backfill workers share the file, wait for each other's writes instead of failing
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS scoreboards (
+                date TEXT PRIMARY KEY,
+                game_count INTEGER NOT NULL,
+                final INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS schedule (
+                game_id TEXT PRIMARY KEY,
+                date TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS schedule_date ON schedule (date);
+            """
+        )
+
+    def record(self, d: date, game_ids: List[str], fetched_at: datetime = None):
+        fetched_at = fetched_at or datetime.now()
+        final = d < fetched_at.date()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scoreboards VALUES (?, ?, ?, ?)",
+                (d.isoformat(), len(game_ids), int(final), fetched_at.isoformat()),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO schedule VALUES (?, ?)",
+                [(g, d.isoformat()) for g in game_ids],
+            )
+
+    def done_dates(self, ingested: Optional[Set[str]] = None) -> Set[date]:
+        # dates that never need to be requested again: settled days without games, and
+        # settled days whose games are all in `ingested` (usually nbaDB.game_ids()).
+        done = set()
+        pending = set()
+        for d, count in self.conn.execute(
+            "SELECT date, game_count FROM scoreboards WHERE final = 1"
+        ):
+            if count == 0:
+                done.add(d)
+            elif ingested is not None:
+                pending.add(d)
+        if pending:
+            missing = {
+                d
+                for d, game_id in self.conn.execute("SELECT date, game_id FROM schedule")
+                if d in pending and game_id not in ingested
+            }
+            done.update(pending - missing)
+        return {date.fromisoformat(d) for d in done}
+
+    def rows(self) -> List[tuple]:
+        # one (date, game_id) row per game and a (date, None) row for every day without games
+        return self.conn.execute(
+            """
+            SELECT s.date, g.game_id FROM scoreboards s
+            LEFT JOIN schedule g ON g.date = s.date
+            ORDER BY s.date, g.game_id
+            """
+        ).fetchall()
+
+    def export(self, path: str):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["date", "game_id"])
+            writer.writerows(self.rows())
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    # python -m game_crawlers.nba.schedule schedule.csv
+    out = sys.argv[1] if len(sys.argv) > 1 else "schedule.csv"
+    index = ScheduleIndex()
+    index.export(out)
+    index.close()
+    print(f"wrote schedule to {out}")
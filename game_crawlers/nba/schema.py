@@ -0,0 +1,195 @@
+import re
+from typing import Callable, Dict
+
+from game_crawlers.nba.fields import PlayerStats, TeamStats, converters
+
+# Stat schema shared by the NBA spiders: for each source the mapping from the site's stat
+# names onto the scrapy fields in fields.py, the default values filled in for stats a row
+# doesn't have, and the regexes the parsers run. Everything here is built once at import
+# time, the parsers only look things up.
+
+
+# {field: int or float} converters declared on the items in fields.py
+PLAYER_STAT_TYPES = converters(PlayerStats)
+TEAM_STAT_TYPES = converters(TeamStats)
+
+
+def defaults(stat_map: Dict[str, str], types: Dict[str, Callable]) -> Dict[str, object]:
+    # a zero of the field's type for every field a stat map produces
+    return {field: types.get(field, int)(0) for field in stat_map.values()}
+
+
+# basketball-reference, keyed by the data-stat attribute of the table cells
+BBREF_BASIC_STATS = {
+    "fg": "fgm",
+    "fga": "fga",
+    "fg_pct": "fg_per",
+    "fg3": "x3pm",
+    "fg3a": "x3pa",
+    "fg3_pct": "x3p_per",
+    "ft": "ftm",
+    "fta": "fta",
+    "ft_pct": "ft_per",
+    "orb": "orebs",
+    "drb": "drebs",
+    "trb": "rebounds",
+    "ast": "assists",
+    "stl": "steals",
+    "blk": "blocks",
+    "tov": "turnovers",
+    "pf": "fouls",
+    "pts": "points",
+}
+BBREF_ADVANCED_STATS = {
+    "ts_pct": "ts_per",
+    "efg_pct": "efg_per",
+    "fg3a_per_fga_pct": "x3p_ar",
+    "fta_per_fga_pct": "ft_ar",
+    "orb_pct": "oreb_per",
+    "drb_pct": "dreb_per",
+    "trb_pct": "reb_per",
+    "ast_pct": "ast_per",
+    "stl_pct": "stl_per",
+    "blk_pct": "blk_per",
+    "tov_pct": "tov_per",
+    "usg_pct": "usg_per",
+    "off_rtg": "off_rating",
+    "def_rtg": "def_rating",
+}
+
+# player rows carry plus/minus and minutes played ("40:53", converted separately), the
+# advanced table adds box plus/minus whose tooltip holds obpm, dbpm and vorp.
+BBREF_PLAYER_BASIC = {**BBREF_BASIC_STATS, "plus_minus": "plus_minus", "mp": "mp"}
+BBREF_PLAYER_ADVANCED = {
+    **BBREF_ADVANCED_STATS,
+    "bpm": "bpm",
+    "obpm": "obpm",
+    "dbpm": "dbpm",
+    "vorp": "vorp",
+}
+BBREF_PLAYER_BASIC_DEFAULTS = defaults(
+    {k: v for k, v in BBREF_PLAYER_BASIC.items() if k != "mp"}, PLAYER_STAT_TYPES
+)
+BBREF_PLAYER_ADVANCED_DEFAULTS = defaults(BBREF_PLAYER_ADVANCED, PLAYER_STAT_TYPES)
+
+# team totals come from the footer of the same tables
+BBREF_TEAM_BASIC = BBREF_BASIC_STATS
+BBREF_TEAM_ADVANCED = BBREF_ADVANCED_STATS
+BBREF_FOUR_FACTOR = {"pace": "pace", "ft_rate": "ft_per_fga"}
+BBREF_LINE_SCORE = {
+    "1": "x1q_pts",
+    "2": "x2q_pts",
+    "3": "x3q_pts",
+    "4": "x4q_pts",
+}
+
+BBREF_BOXSCORE_LINK_RE = re.compile(r"boxscores/(?P<game_id>[0-9][0-9A-Z]*)\.html")
+BBREF_TEAM_HREF_RE = re.compile(r"teams/(?P<abbr>[A-Z]{3})")
+BBREF_BPM_TIP_RE = re.compile(
+    r"OBPM: (?P<obpm>[0-9.-]+).*?DBPM: (?P<dbpm>[0-9.-]+).*?VORP: (?P<vorp>[0-9.-]+)"
+)
+BBREF_GAME_TIME_RE = re.compile(r"[0-9]{1,2}:[0-9]{2}.*[0-9]{4}")
+BBREF_GAME_DAY_RE = re.compile(r"([A-Za-z]{3,8} [0-9]{1,2}, [0-9]{4})")
+BBREF_RECORD_RE = re.compile(r"[0-9]{1,2}-[0-9]{1,2}")
+BBREF_SCORE_RE = re.compile(r"[0-9]{2,3}")
+
+
+# ESPN, the matchup tab keys its rows by data-stat-attr. Rows without a TeamStats field
+# (points off turnovers, fast break points, points in the paint, technical and flagrant
+# fouls, largest lead) are skipped.
+ESPN_TEAM_STATS = {
+    "fieldGoalsMade": "fgm",
+    "fieldGoalsAttempted": "fga",
+    "fieldGoalPct": "fg_per",
+    "threePointFieldGoalsMade": "x3pm",
+    "threePointFieldGoalsAttempted": "x3pa",
+    "threePointFieldGoalPct": "x3p_per",
+    "freeThrowsMade": "ftm",
+    "freeThrowsAttempted": "fta",
+    "freeThrowPct": "ft_per",
+    "totalRebounds": "rebounds",
+    "offensiveRebounds": "orebs",
+    "defensiveRebounds": "drebs",
+    "assists": "assists",
+    "steals": "steals",
+    "blocks": "blocks",
+    "totalTurnovers": "turnovers",
+    "fouls": "fouls",
+}
+# made-attempted pairs shown in one row, e.g. "fieldGoalsMade-fieldGoalsAttempted" 42-88
+ESPN_SHOT_STATS = {
+    "fieldGoalsMade-fieldGoalsAttempted",
+    "threePointFieldGoalsMade-threePointFieldGoalsAttempted",
+    "freeThrowsMade-freeThrowsAttempted",
+}
+ESPN_TEAM_STAT_RE = re.compile(
+    r"data-stat-attr.*\"(?P<stat>[a-zA-Z-]*)\".*>(?P<away>[0-9-]+).*>(?P<home>[0-9-]+)"
+)
+WHITESPACE_RE = re.compile(r"[\s]")
+
+# boxscore tab, one row per player with a cell per stat named by its class:
+#   <td class="fg">6-13</td><td class="3pt">2-5</td> ... <td class="pts">16</td>
+# the cells of a row are read with one pass of ESPN_CELL_RE into {class: contents}, the name
+# cell keeps its markup for ESPN_PLAYER_NAME_RE
+ESPN_CELL_RE = re.compile(r'<td class="([^"]+)"[^>]*>([^<]*(?:<(?!/td>)[^<]*)*)</td>')
+ESPN_PLAYER_NAME_RE = re.compile(
+    r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+).*position\">(?P<pos>[A-Z]{1,2})"
+)
+# shooting cells as made-attempted, keyed by the cell class: {class: (made, attempts, pct)}
+ESPN_PLAYER_SHOTS = {
+    "fg": ("fgm", "fga", "fg_per"),
+    "3pt": ("x3pm", "x3pa", "x3p_per"),
+    "ft": ("ftm", "fta", "ft_per"),
+}
+ESPN_SHOTS_RE = re.compile(r"(?P<m>[0-9]{1,3})-(?P<a>[0-9]{1,3})$")
+# cells holding a single number ("+8" for plus minus): {class: PlayerStats field}
+ESPN_PLAYER_COUNTS = {
+    "min": "min",
+    "pts": "points",
+    "oreb": "orebs",
+    "dreb": "drebs",
+    "reb": "rebounds",
+    "ast": "assists",
+    "stl": "steals",
+    "blk": "blocks",
+    "to": "turnovers",
+    "pf": "fouls",
+    "plusminus": "plus_minus",
+}
+# every PlayerStats field defaults to a zero of its type, except the player and game they
+# belong to
+ESPN_PLAYER_DEFAULTS = {
+    **defaults({f: f for f in PlayerStats.fields}, PLAYER_STAT_TYPES),
+    "player": None,
+    "game_id": None,
+}
+
+# ESPN abbreviations that differ from basketball-reference's, which the teams table is keyed
+# by. NO and CHA stand for different franchises over the years and are left as they are.
+ESPN_TEAM_ABBREVIATIONS = {
+    "BKN": "BRK",
+    "GS": "GSW",
+    "NJ": "NJN",
+    "NY": "NYK",
+    "PHX": "PHO",
+    "SA": "SAS",
+    "UTAH": "UTA",
+    "WSH": "WAS",
+}
+
+ESPN_RECORD_RE = re.compile(r"[0-9]{1,2}-[0-9]{1,2}")
+ESPN_GAME_TIME_RE = re.compile(r"data-date=\"([A-Z0-9-:]*)\"")
+ESPN_SCORE_RE = re.compile(r"[0-9]{2,3}")
+ESPN_TEAM_NAME_RE = re.compile(r">([A-Za-z0-9/ ]+)<")
+ESPN_LINE_RE = re.compile(r"([A-Z]{2,3} [0-9-.]+)")
+ESPN_OVER_UNDER_RE = re.compile(r"([0-9]{2,3})")
+
+# scoreboard pages, used to discover game ids without a browser. Current pages embed the
+# scoreboard as json in window['__espnfitt__'] (events under "evts"), older ones in
+# window.espn.scoreboardData (under "events"). Game links are the fallback:
+#   /nba/game?gameId=400827888   /nba/game/_/gameId/401584793
+ESPN_SCOREBOARD_JSON_RE = re.compile(
+    r"window\[['\"]__espnfitt__['\"]\]\s*=\s*|window\.espn\.scoreboardData\s*=\s*"
+)
+ESPN_SCOREBOARD_EVENT_KEYS = ("evts", "events")
+ESPN_GAME_ID_RE = re.compile(r"gameId[=/](?P<game_id>[0-9]+)")
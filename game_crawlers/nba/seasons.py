@@ -1,5 +1,7 @@
+from bisect import bisect_right
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
+from typing import NamedTuple, Optional
 
 
 @dataclass
@@ -222,3 +224,81 @@ class Seasons:
             "post_season_end": datetime(2026, 6, 21),
         },
     }
+
+
+REGULAR_SEASON = "regular_season"
+# between the last regular season game and the first playoff game (play-in tournament)
+BETWEEN = "between"
+POST_SEASON = "post_season"
+
+# dates the scorebox and the stored items use: "7:30 PM, January 3, 2006", "January 3, 2006"
+DATE_FORMATS = ("%I:%M %p, %B %d, %Y", "%B %d, %Y")
+
+
+class SeasonPhase(NamedTuple):
+    season: str
+    phase: str
+
+
+class SeasonCalendar:
+    """
+    Index over Seasons.season_info for date lookups. Seasons are kept sorted by their first
+    day, so the season a date falls in is found with one bisect instead of a scan over every
+    season, and its phase with two comparisons.
+    """
+
+    def __init__(self, season_info: dict):
+        seasons = sorted(
+            season_info.items(), key=lambda s: s[1]["regular_season_start"]
+        )
+        self.starts = [v["regular_season_start"].date() for _, v in seasons]
+        self.seasons = [
+            (
+                k,
+                v["regular_season_end"].date(),
+                v["post_season_start"].date(),
+                v["post_season_end"].date(),
+            )
+            for k, v in seasons
+        ]
+        self.ends = {k: end for k, _, _, end in self.seasons}
+
+    def lookup(self, d: date) -> Optional[SeasonPhase]:
+        # season and phase of a date, None outside of every season
+        i = bisect_right(self.starts, d) - 1
+        if i < 0:
+            return None
+        season, regular_end, post_start, post_end = self.seasons[i]
+        if d > post_end:
+            return None
+        if d <= regular_end:
+            return SeasonPhase(season, REGULAR_SEASON)
+        if d < post_start:
+            return SeasonPhase(season, BETWEEN)
+        return SeasonPhase(season, POST_SEASON)
+
+    def season_end(self, season: str) -> Optional[date]:
+        return self.ends.get(season)
+
+
+calendar = SeasonCalendar(Seasons.season_info)
+
+
+def season_of(d: date) -> Optional[SeasonPhase]:
+    return calendar.lookup(d)
+
+
+def to_date(value) -> Optional[date]:
+    # converts a game date as found in items (a date, an iso date string or the scorebox
+    # text) to a date, None when it can't be read
+    if value is None or isinstance(value, date):
+        return value.date() if isinstance(value, datetime) else value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
@@ -0,0 +1,114 @@
+from typing import Callable, Dict, List, Optional, Union
+
+import lxml.html
+
+# Helpers for reading basketball-reference stat tables straight from the parsed lxml tree.
+# Every cell on the site carries a data-stat attribute naming the stat it holds, so each row is
+# walked once and its cells are mapped onto scrapy fields by that attribute, instead of
+# serializing rows back to html strings and running regexes over them.
+#
+#   <tr><th data-stat="player" data-append-csv="harklma01" csk="Harkless,Maurice">...</th>
+#       <td data-stat="mp" csk="2453">40:53</td><td data-stat="fg">6</td>...</tr>
+
+Value = Union[int, float, str, None]
+
+
+def stat_rows(table) -> List[object]:
+    # returns the body rows of a table, skipping the repeated header rows (class="thead")
+    # that split starters from reserves.
+    if table is None:
+        return []
+    rows = list()
+    for tbody in table.iterchildren("tbody"):
+        for tr in tbody.iterchildren("tr"):
+            if "thead" not in (tr.get("class") or ""):
+                rows.append(tr)
+    return rows
+
+
+def stat_footer(table) -> Optional[object]:
+    # returns the team totals row found in the table footer
+    if table is None:
+        return None
+    for tfoot in table.iterchildren("tfoot"):
+        for tr in tfoot.iterchildren("tr"):
+            return tr
+    return None
+
+
+def comment_table(comment) -> Optional[object]:
+    # some tables (four factors, line score) are shipped inside an html comment that the
+    # site's javascript unwraps, so the comment body is parsed as its own fragment.
+    if comment is None or not (comment.text or "").strip():
+        return None
+    fragment = lxml.html.fragment_fromstring(comment.text, create_parent="div")
+    return fragment.find(".//table")
+
+
+def rows_by_team(table) -> Dict[str, object]:
+    # keys the body rows of a per-team table (four factors, line score) by the team
+    # abbreviation in the row header: <th data-stat="team"><a href=..>NJN</a></th>
+    teams = dict()
+    for tr in stat_rows(table):
+        if len(tr):
+            teams[cell_text(tr[0])] = tr
+    return teams
+
+
+def stat_cell(row, stat: str) -> Optional[object]:
+    return row.find(f'*[@data-stat="{stat}"]')
+
+
+def cell_text(cell) -> str:
+    # most cells hold bare text, only walk the children when there are some (<a>, <strong>)
+    if len(cell):
+        return "".join(cell.itertext()).strip()
+    return (cell.text or "").strip()
+
+
+def to_value(text: str) -> Value:
+    # converts a cell's text to a number: "6" -> 6, ".462" -> 0.462, "+10" -> 10. Empty cells
+    # become None and anything that isn't a number (minutes like "40:53") stays a string.
+    if not text:
+        return None
+    try:
+        return float(text) if "." in text else int(text)
+    except ValueError:
+        return text
+
+
+def map_stats(
+    row, stat_map: Dict[str, str], types: Dict[str, Callable] = None
+) -> Dict[str, Value]:
+    # maps the cells of one row onto field names using a {data-stat: field} map in a single
+    # pass over the row. Values are converted with the field's converter from `types`
+    # ({field: int or float}, see fields.converters), fields without one go through to_value.
+    # Stats that are missing, empty or not a number are left out so callers can fill in
+    # defaults.
+    stats = dict()
+    if row is None:
+        return stats
+    # this runs for every cell of every box score, so cell_text is only used for cells
+    # whose text sits in a child element.
+    lookup = stat_map.get
+    converter_for = (types or {}).get
+    for cell in row:
+        field = lookup(cell.get("data-stat"))
+        if field is None:
+            continue
+        text = cell.text
+        if text is None:
+            text = cell_text(cell)
+        if not text:
+            continue
+        convert = converter_for(field)
+        if convert is None:
+            value = to_value(text.strip())
+            if value is not None:
+                stats[field] = value
+            continue
+        try:
+            stats[field] = convert(text)
+        except ValueError:
+            continue
+    return stats
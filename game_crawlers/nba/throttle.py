@@ -0,0 +1,228 @@
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+
+# Named crawl profiles, selected with --profile on nba_scraper.py and nba_daily.py. Instead of
+# a fixed DOWNLOAD_DELAY every host gets a token bucket refilled at HOST_RATE_LIMITS requests
+# per second that holds at most HOST_BURST tokens. HostThrottleMiddleware sits after the http
+# cache middleware (900), so responses served from the cache never wait for a token.
+#
+# basketball-reference blocks clients that go over 20 requests a minute, so no profile lets
+# it go faster than that, profiles differ in how close they get and in what other hosts get.
+BBREF_HOST = "www.basketball-reference.com"
+
+CRAWL_PROFILES = {
+    # one request every 6 seconds, for running next to other jobs on the same address
+    "polite": {
+        "HOST_RATE_LIMITS": {BBREF_HOST: 1 / 6},
+        "HOST_RATE_DEFAULT": 0.5,
+        "HOST_BURST": 1,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
+    },
+    # the site's limit with a margin, the previous DOWNLOAD_DELAY = 3
+    "standard": {
+        "HOST_RATE_LIMITS": {BBREF_HOST: 1 / 3.2},
+        "HOST_RATE_DEFAULT": 1.0,
+        "HOST_BURST": 1,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 2,
+    },
+    # right at the site's limit, for backfills that mostly hit the response cache
+    "backfill": {
+        "HOST_RATE_LIMITS": {BBREF_HOST: 1 / 3},
+        "HOST_RATE_DEFAULT": 2.0,
+        "HOST_BURST": 1,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 4,
+    },
+}
+DEFAULT_PROFILE = "standard"
+
+
+def profile_settings(name: str) -> dict:
+    # settings for a crawl profile, replacing scrapy's global delay and autothrottle
+    return {
+        "DOWNLOAD_DELAY": 0,
+        "AUTOTHROTTLE_ENABLED": False,
+        "HOST_THROTTLE_ENABLED": True,
+        "DOWNLOADER_MIDDLEWARES": {
+            "game_crawlers.nba.throttle.HostThrottleMiddleware": 950,
+        },
+        **CRAWL_PROFILES[name],
+    }
+
+
+def split_budget(settings: dict, workers: int) -> dict:
+    # divides the host rate limits of a profile between crawler processes running side by
+    # side, so together they stay within what one process would be allowed
+    workers = max(1, workers)
+    split = dict(settings)
+    split["HOST_RATE_LIMITS"] = {
+        host: rate / workers for host, rate in settings.get("HOST_RATE_LIMITS", {}).items()
+    }
+    split["HOST_RATE_DEFAULT"] = settings.get("HOST_RATE_DEFAULT", 1.0) / workers
+    return split
+
+
+class TokenBucket:
+    """
+    Request budget of one host. Tokens refill at `rate` per second up to `burst`, each request
+    takes one, and reserve() returns how long a request has to wait for its token. The rate
+    moves between `min_rate` and the profile's `max_rate`: it is halved when the host answers
+    429/503 and creeps back up by a small step after every good response, and a Retry-After
+    header stops the bucket until that time.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.01):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+        # a token is taken now even if it only becomes available later, so requests that
+        # arrive together are spaced out instead of all waiting for the same token
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def slow_down(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self, step: float):
+        self.rate = min(self.max_rate, self.rate + step)
+
+    def pause(self, seconds: float, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class RateLimiter:
+    """
+    TokenBucket shared by threads outside of scrapy: wait() blocks the calling thread until
+    its request may be sent.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            wait = self.bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        # holds every thread's next request, e.g. for a Retry-After
+        with self.lock:
+            self.bucket.pause(seconds)
+
+
+class HostThrottleMiddleware(object):
+    """
+    Downloader middleware that spaces requests per host with a TokenBucket. Backs off on
+    429/503 and on latency above HOST_LATENCY_TARGET seconds, honours Retry-After and records
+    the waits, the current rate of every host and the effective requests per second in the
+    crawl stats.
+    """
+
+    def __init__(self, settings, stats):
+        self.stats = stats
+        self.limits: Dict[str, float] = settings.getdict("HOST_RATE_LIMITS")
+        self.default_rate = settings.getfloat("HOST_RATE_DEFAULT", 1.0)
+        self.burst = settings.getint("HOST_BURST", 1)
+        self.latency_target = settings.getfloat("HOST_LATENCY_TARGET", 5.0)
+        self.backoff_codes = set(
+            int(c) for c in settings.getlist("HOST_BACKOFF_HTTP_CODES", [429, 503])
+        )
+        self.buckets: Dict[str, TokenBucket] = dict()
+        self.started = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("HOST_THROTTLE_ENABLED"):
+            raise NotConfigured
+        o = cls(crawler.settings, crawler.stats)
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_opened(self, spider):
+        self.started = time.monotonic()
+
+    def spider_closed(self, spider):
+        self._record_rates(spider)
+        for host, bucket in self.buckets.items():
+            spider.logger.info(f"{host}: ended at {bucket.rate:.3f} requests/sec")
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self.buckets:
+            rate = float(self.limits.get(host, self.default_rate))
+            self.buckets[host] = TokenBucket(rate, self.burst)
+        return self.buckets[host]
+
+    def process_request(self, request, spider):
+        host = urlparse(request.url).hostname or ""
+        wait = self.bucket(host).reserve()
+        self.stats.inc_value("throttle/requests", spider=spider)
+        if wait <= 0:
+            return None
+        self.stats.inc_value("throttle/delayed", spider=spider)
+        self.stats.inc_value("throttle/wait_seconds", wait, spider=spider)
+        return deferLater(reactor, wait, lambda: None)
+
+    def process_response(self, request, response, spider):
+        if "cached" in response.flags:
+            # cache hits never reached the host, they say nothing about how it is coping
+            return response
+        host = urlparse(request.url).hostname or ""
+        bucket = self.bucket(host)
+        if response.status in self.backoff_codes:
+            bucket.slow_down()
+            retry_after = self._retry_after(response)
+            if retry_after:
+                bucket.pause(retry_after)
+            self.stats.inc_value("throttle/backoff", spider=spider)
+            spider.logger.warning(
+                f"{host} answered {response.status}, slowing down to "
+                f"{bucket.rate:.3f} requests/sec"
+                + (f" and pausing {retry_after:.0f}s" if retry_after else "")
+            )
+        elif request.meta.get("download_latency", 0) > self.latency_target:
+            bucket.slow_down()
+        else:
+            # additive increase, back to the profile's rate over ~20 good responses
+            bucket.speed_up(bucket.max_rate / 20)
+        self.stats.set_value(f"throttle/rate/{host}", bucket.rate, spider=spider)
+        self._record_rates(spider)
+        return response
+
+    def _record_rates(self, spider):
+        elapsed = time.monotonic() - self.started
+        if elapsed <= 0:
+            return
+        requests = self.stats.get_value("throttle/requests", 0, spider=spider)
+        responses = self.stats.get_value("downloader/response_count", 0, spider=spider)
+        # network requests per second, and every response including cache hits
+        self.stats.set_value("throttle/requests_per_sec", requests / elapsed, spider=spider)
+        self.stats.set_value("throttle/responses_per_sec", responses / elapsed, spider=spider)
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        # only the delay-seconds form, http dates are rare enough to fall back to the backoff
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else 0.0
+        except ValueError:
+            return 0.0
@@ -0,0 +1,115 @@
+import argparse
+import multiprocessing
+import os
+from functools import partial
+
+from game_crawlers.nba.backfill import (
+    DEFAULT_CHECKPOINT_DIR,
+    SHARD_BY,
+    Checkpoints,
+    build_shards,
+    crawl_shard,
+)
+from game_crawlers.nba.bbref_crawler import BBRefScoreboard
+from game_crawlers.nba.httpcache import HTTPCACHE_SETTINGS
+from game_crawlers.nba.schedule import ScheduleIndex
+from game_crawlers.nba.throttle import (
+    CRAWL_PROFILES,
+    DEFAULT_PROFILE,
+    profile_settings,
+    split_budget,
+)
+from db import nba
+
+# Parallel version of nba_scraper.py: the scoreboard dates are split into season or month
+# shards that are crawled by --workers processes, each with its own reactor and database
+# pipeline. The profile's per host rate limits are divided between the workers so the
+# backfill as a whole is no harder on the sites than a single crawler. Finished shards are
+# checkpointed, rerunning the command resumes with the ones that are left.
+#
+#   python nba_backfill.py --workers 4 --shard-by season --profile backfill
+
+USER = os.environ["dbName"]
+PASSWORD = os.environ["dbPass"]
+
+
+def worker_settings(profile: str, workers: int) -> dict:
+    # plain dict so it can be sent to the worker processes
+    settings = {
+        "COOKIES_ENABLED": False,
+        "LOG_LEVEL": "INFO",
+        "ITEM_PIPELINES": {
+            "game_crawlers.nba.pipelines.DBWriterPipeline": 100,
+        },
+        "DB_BATCH_SIZE": 50,
+        "DB_BATCH_SECONDS": 60,
+        "DB_WRITE_MODE": "copy",
+        "DB_WRITE_THREADS": 2,
+        "DB_MAX_PENDING_WRITES": 4,
+        "SKIP_KNOWN_GAMES": True,
+        "FRONTIER_ENABLED": True,
+        "FRONTIER_CHECK_STORED": True,
+        "SPIDER_MIDDLEWARES": {
+            "game_crawlers.nba.frontier.CrawlFrontierMiddleware": 80,
+            "game_crawlers.nba.middlewares.KnownGameFilterMiddleware": 100,
+        },
+    }
+    settings.update(split_budget(profile_settings(profile), workers))
+    settings.update(HTTPCACHE_SETTINGS)
+    return settings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="backfill every season with several crawlers")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--shard-by", choices=SHARD_BY, default="season")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(CRAWL_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="request rate limits shared by all workers, see game_crawlers/nba/throttle.py",
+    )
+    parser.add_argument("--checkpoints", default=DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument(
+        "--restart", action="store_true", help="forget checkpoints and crawl every shard"
+    )
+    args = parser.parse_args()
+
+    checkpoints = Checkpoints(args.checkpoints)
+    if args.restart:
+        checkpoints.reset()
+
+    schedule = ScheduleIndex()
+    db = nba.nbaDB(USER, PASSWORD)
+    ingested = db.game_ids()
+    db.close()
+    shards = build_shards(BBRefScoreboard(schedule, ingested), args.shard_by)
+    schedule.close()
+
+    todo = [s for s in shards if not checkpoints.done(s.key)]
+    print(
+        f"{len(shards)} shards, {len(shards) - len(todo)} already done, "
+        f"crawling {sum(len(s.urls) for s in todo)} scoreboard dates on {args.workers} workers"
+    )
+
+    # spawn, so no worker inherits a reactor, sqlite handle or database pool from this process,
+    # and a new process per shard because the reactor can't be restarted
+    context = multiprocessing.get_context("spawn")
+    settings = worker_settings(args.profile, args.workers)
+    failed = list()
+    with context.Pool(args.workers, maxtasksperchild=1) as pool:
+        run = partial(crawl_shard, settings=settings, checkpoint_dir=args.checkpoints)
+        for result in pool.imap_unordered(run, todo):
+            print(
+                f"shard {result['shard']} {result['status']}: {result['urls']} dates, "
+                f"{result['games_written']} games, {result['requests_per_sec']:.2f} requests/sec"
+            )
+            if result.get("error"):
+                print(f"shard {result['shard']} error: {result['error']}")
+            if result["status"] == "failed":
+                failed.append(result["shard"])
+
+    if failed:
+        print(f"{len(failed)} shards failed, rerun to retry: {', '.join(sorted(failed))}")
+    else:
+        print("backfill completed")
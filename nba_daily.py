@@ -1,10 +1,13 @@
 from scrapy.utils.project import get_project_settings
 from scrapy.crawler import CrawlerProcess
+import argparse
 import os
-import sys
 from datetime import datetime, timedelta
 
 from game_crawlers.nba.bbref_crawler import BBRefSpider, BBRefScoreboard
+from game_crawlers.nba.httpcache import HTTPCACHE_SETTINGS
+from game_crawlers.nba.schedule import ScheduleIndex
+from game_crawlers.nba.throttle import CRAWL_PROFILES, DEFAULT_PROFILE, profile_settings
 
 # Credentials and DB host read from environment variables.
 # Set DB_HOST to the Docker container name or IP when running against a container.
@@ -12,9 +15,19 @@ USER = os.environ["dbName"]
 PASSWORD = os.environ["dbPass"]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="crawl one day of games")
+    parser.add_argument("date", nargs="?", help="YYYY-MM-DD, defaults to yesterday")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(CRAWL_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="request rate limits to crawl with, see game_crawlers/nba/throttle.py",
+    )
+    args = parser.parse_args()
+
     # Default to yesterday. Optionally pass a date as YYYY-MM-DD argument.
-    if len(sys.argv) > 1:
-        target_date = datetime.strptime(sys.argv[1], "%Y-%m-%d")
+    if args.date:
+        target_date = datetime.strptime(args.date, "%Y-%m-%d")
     else:
         target_date = datetime.now() - timedelta(days=1)
 
@@ -24,16 +37,21 @@ if __name__ == "__main__":
 
     settings = get_project_settings()
     settings["COOKIES_ENABLED"] = False
-    settings["DOWNLOAD_DELAY"] = 3
     settings["LOG_LEVEL"] = "INFO"
     settings["ITEM_PIPELINES"] = {
         "game_crawlers.nba.pipelines.DBWriterPipeline": 100,
     }
-    settings["AUTOTHROTTLE_ENABLED"] = True
-    settings["AUTOTHROTTLE_TARGET_CONCURRENCY"] = 1
+    # writes run on a worker thread instead of blocking the reactor
+    settings["DB_WRITE_THREADS"] = 1
+    settings.update(profile_settings(args.profile))
+    settings.update(HTTPCACHE_SETTINGS)
+    settings["SKIP_KNOWN_GAMES"] = True
+    settings["SPIDER_MIDDLEWARES"] = {
+        "game_crawlers.nba.middlewares.KnownGameFilterMiddleware": 100,
+    }
 
     process = CrawlerProcess(settings)
-    process.crawl(BBRefSpider, urls=url)
+    process.crawl(BBRefSpider, urls=url, schedule=ScheduleIndex())
     print("starting crawler")
     process.start()
     print("crawling completed")
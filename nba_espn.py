@@ -0,0 +1,55 @@
+from scrapy.utils.project import get_project_settings
+from scrapy.crawler import CrawlerProcess
+import argparse
+from datetime import date
+
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+from game_crawlers.nba.game_id_store import DEFAULT_PATH, GameIdStore
+from game_crawlers.nba.seasons import POST_SEASON, REGULAR_SEASON, Seasons
+from game_crawlers.nba.throttle import CRAWL_PROFILES, DEFAULT_PROFILE, profile_settings
+
+# Crawls the ESPN pages of the games in the game id store, filled by
+# python -m game_crawlers.nba.espn_ids (or game_ids.py), for any window of days.
+#
+#   python nba_espn.py --start 2006-01-01 --end 2006-01-31
+#   python nba_espn.py --season 05-06 --phase post_season
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="crawl ESPN boxscores of stored game ids")
+    parser.add_argument("--season", action="append", choices=list(Seasons.season_info))
+    parser.add_argument("--phase", action="append", choices=[REGULAR_SEASON, POST_SEASON])
+    parser.add_argument("--start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument("--store", default=DEFAULT_PATH)
+    parser.add_argument(
+        "--db", action="store_true", help="also write the games to the database"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(CRAWL_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="request rate limits to crawl with, see game_crawlers/nba/throttle.py",
+    )
+    args = parser.parse_args()
+
+    store = GameIdStore(args.store)
+    ids = store.game_ids(args.start, args.end, args.season, args.phase)
+    store.close()
+    print(f"{len(ids)} games to crawl")
+
+    settings = get_project_settings()
+    settings["COOKIES_ENABLED"] = False
+    settings["LOG_LEVEL"] = "INFO"
+    settings["ITEM_PIPELINES"] = {
+        "game_crawlers.nba.pipelines.JsonWriterPipeline": 100,
+    }
+    if args.db:
+        # every game comes out as one record, the same shape BBRefSpider yields
+        settings["ITEM_PIPELINES"]["game_crawlers.nba.pipelines.DBWriterPipeline"] = 200
+    settings.update(profile_settings(args.profile))
+
+    process = CrawlerProcess(settings)
+    process.crawl(NBAESPNSpider, ids=ids)
+    print("starting crawler")
+    process.start()
+    print("crawling completed")
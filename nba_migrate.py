@@ -1,13 +1,29 @@
 import os
-from sqlalchemy import create_engine
 from db import nba
+from db.engine import get_engine
 
 USER = os.environ["dbName"]
 PASSWORD = os.environ["dbPass"]
-HOST = os.environ.get("DB_HOST", "localhost")
 
 if __name__ == "__main__":
-    engine = create_engine(
-        f"postgresql://{USER}:{PASSWORD}@{HOST}:5432/nba_stats", echo=True
-    )
+    engine = get_engine(USER, PASSWORD, echo=True)
     nba.Base.metadata.create_all(engine)
+
+    # create_all does not alter existing tables, add the unique keys used as conflict
+    # targets by the batched writer to databases created before they were introduced.
+    # Re-scrapes through the old add_record path could store a game's stats twice, those
+    # duplicates are deleted first, keeping the row written first (lowest id) of each key.
+    with engine.begin() as conn:
+        for table, key, index in (
+            ("team_stats", ("game_id", "team_abbr"), "team_stats_game_id_team_abbr_key"),
+            ("player_stats", ("game_id", "player_id"), "player_stats_game_id_player_id_key"),
+        ):
+            same_key = " AND ".join(f"t.{c} = d.{c}" for c in key)
+            deleted = conn.execute(
+                f"DELETE FROM {table} t USING {table} d WHERE {same_key} AND t.id > d.id"
+            ).rowcount
+            if deleted:
+                print(f"deleted {deleted} duplicate rows from {table}")
+            conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({', '.join(key)})"
+            )
@@ -0,0 +1,208 @@
+import argparse
+import gzip
+import os
+import pickle
+import re
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterator, Tuple
+
+from scrapy.http import HtmlResponse
+
+from game_crawlers.nba.bbref_crawler import BBRefSpider
+
+# Re-runs the basketball-reference boxscore parser over html that was already downloaded,
+# so parser fixes don't require a re-crawl. SOURCE can be
+#   - a directory of <game_id>.html / <game_id>.html.gz files
+#   - a tar archive of those files (.tar, .tar.gz, .tar.xz, or .tar.zst with zstandard installed)
+#   - the scrapy http cache directory written by nba_scraper.py (see httpcache.py)
+#
+#   python nba_reparse.py .scrapy/httpcache --output jsonl --out reparsed.json
+#   python nba_reparse.py games.tar.gz --output parquet --out reparsed/  (needs pyarrow)
+
+GAME_ID_REGEX = re.compile(r"([0-9]{9}[A-Z]{3})")
+BOXSCORE_URL = "https://www.basketball-reference.com/boxscores/{}.html"
+
+_spider = None
+
+
+def iter_directory(path: str) -> Iterator[Tuple[str, bytes]]:
+    for root, _, files in os.walk(path):
+        if "pickled_meta" in files:
+            yield from _read_cache_entry(root)
+            continue
+        for name in sorted(files):
+            if name.endswith(".html") or name.endswith(".html.gz"):
+                with open(os.path.join(root, name), "rb") as f:
+                    yield _page(name, f.read())
+
+
+def iter_archive(path: str) -> Iterator[Tuple[str, bytes]]:
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("reading .zst archives requires the zstandard package")
+        with open(path, "rb") as raw:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+            with tarfile.open(fileobj=stream, mode="r|") as tar:
+                yield from _iter_tar(tar)
+    else:
+        with tarfile.open(path, mode="r:*") as tar:
+            yield from _iter_tar(tar)
+
+
+def _iter_tar(tar: tarfile.TarFile) -> Iterator[Tuple[str, bytes]]:
+    for member in tar:
+        name = os.path.basename(member.name)
+        if member.isfile() and (name.endswith(".html") or name.endswith(".html.gz")):
+            yield _page(name, tar.extractfile(member).read())
+
+
+def _read_cache_entry(path: str) -> Iterator[Tuple[str, bytes]]:
+    # scrapy's filesystem cache keeps the request url in pickled_meta and the raw body in
+    # response_body, both gzipped when HTTPCACHE_GZIP is on.
+    meta = pickle.loads(_maybe_gunzip(_read(os.path.join(path, "pickled_meta"))))
+    match = GAME_ID_REGEX.search(meta.get("url", ""))
+    if meta.get("status") == 200 and match and "boxscores/" in meta["url"]:
+        yield match.group(1), _maybe_gunzip(_read(os.path.join(path, "response_body")))
+
+
+def _page(name: str, body: bytes) -> Tuple[str, bytes]:
+    match = GAME_ID_REGEX.search(name)
+    game_id = match.group(1) if match else name.split(".")[0]
+    return game_id, _maybe_gunzip(body)
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _maybe_gunzip(body: bytes) -> bytes:
+    return gzip.decompress(body) if body[:2] == b"\x1f\x8b" else body
+
+
+def parse_page(page: Tuple[str, bytes]) -> dict:
+    global _spider
+    if _spider is None:
+        _spider = BBRefSpider(urls=[])
+    game_id, body = page
+    response = HtmlResponse(
+        url=BOXSCORE_URL.format(game_id), body=body, encoding="utf-8"
+    )
+    return _spider.parse_boxscore(response, game_id=game_id)
+
+
+def reparse(pages: Iterator[Tuple[str, bytes]], workers: int) -> Iterator[dict]:
+    # keeps a bounded window of pages in flight so large archives are never read into
+    # memory all at once, results are yielded as soon as any worker finishes.
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for page in pages:
+            pending.add(pool.submit(parse_page, page))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from _results(done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from _results(done)
+
+
+def _results(done) -> Iterator[dict]:
+    for future in done:
+        try:
+            yield future.result()
+        except Exception as e:
+            print(f"failed to parse boxscore: {e!r}")
+
+
+def write_parquet(items: Iterator[dict], out: str):
+    import pandas as pd
+
+    games, teams, players = [], [], []
+    for item in items:
+        game_id = item["game_data"]["game_id"]
+        games.append(item["game_data"])
+        teams.extend(item["team_stats"].values())
+        for k, stats in item["player_stats"].items():
+            for p in stats:
+                players.append(dict(p, game_id=game_id, home=(k == "home_stats")))
+        yield item
+
+    os.makedirs(out, exist_ok=True)
+    for name, rows in (("games", games), ("team_stats", teams), ("player_stats", players)):
+        pd.json_normalize(rows).to_parquet(os.path.join(out, f"{name}.parquet"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="re-parse saved boxscore html")
+    parser.add_argument("source", help="directory, tar archive or scrapy http cache")
+    parser.add_argument(
+        "--output", choices=["db", "jsonl", "parquet"], default="jsonl"
+    )
+    parser.add_argument(
+        "--out", default="items.json", help="jsonl file or parquet directory"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument(
+        "--write-mode",
+        choices=["upsert", "copy"],
+        default="copy",
+        help="how batches are written with --output db",
+    )
+    args = parser.parse_args()
+
+    if args.output == "parquet":
+        # to_parquet needs pyarrow or fastparquet, which aren't in requirements.txt. Checked
+        # here so a missing engine fails before the whole source has been parsed
+        try:
+            from pandas.io.parquet import get_engine
+
+            get_engine("auto")
+        except ImportError as e:
+            parser.error(f"--output parquet needs pyarrow or fastparquet installed: {e}")
+
+    if os.path.isdir(args.source):
+        pages = iter_directory(args.source)
+    else:
+        pages = iter_archive(args.source)
+
+    spider = BBRefSpider(urls=[])
+    pipelines = []
+    if args.output == "db":
+        from game_crawlers.nba.pipelines import DBWriterPipeline
+
+        pipelines.append(
+            DBWriterPipeline(batch_size=args.batch_size, write_mode=args.write_mode)
+        )
+    elif args.output == "jsonl":
+        from game_crawlers.nba.pipelines import JsonWriterPipeline
+
+        pipelines.append(JsonWriterPipeline(path=args.out))
+
+    for p in pipelines:
+        p.open_spider(spider)
+
+    items = reparse(pages, args.workers)
+    if args.output == "parquet":
+        items = write_parquet(items, args.out)
+
+    start = time.monotonic()
+    count = 0
+    for item in items:
+        for p in pipelines:
+            item = p.process_item(item, spider)
+        count += 1
+        if count % 500 == 0:
+            rate = count / (time.monotonic() - start)
+            print(f"parsed {count} games - {rate:.1f} games/sec")
+
+    for p in pipelines:
+        p.close_spider(spider)
+    elapsed = time.monotonic() - start
+    rate = count / elapsed if elapsed else 0
+    print(f"parsed {count} games in {elapsed:.1f}s - {rate:.1f} games/sec")
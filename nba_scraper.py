@@ -1,35 +1,95 @@
 from scrapy.utils.project import get_project_settings
 from scrapy.crawler import CrawlerProcess
+import argparse
 import os
 import json
 import time
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List
 
 from game_crawlers.nba.bbref_crawler import BBRefSpider, BBRefScoreboard
-from game_crawlers.nba.seasons import Seasons
+from game_crawlers.nba.httpcache import HTTPCACHE_SETTINGS
+from game_crawlers.nba.schedule import ScheduleIndex
+from game_crawlers.nba.seasons import POST_SEASON, REGULAR_SEASON, Seasons
+from game_crawlers.nba.throttle import CRAWL_PROFILES, DEFAULT_PROFILE, profile_settings
 from db import nba
 
 # TODO read game ids by date in docker volume
-# TODO add flags to specify date range
+
+USER = os.environ["dbName"]
+PASSWORD = os.environ["dbPass"]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="crawl every season from basketball-reference")
+    parser.add_argument(
+        "--season",
+        action="append",
+        choices=list(Seasons.season_info),
+        help="only crawl this season, e.g. 05-06, can be repeated",
+    )
+    parser.add_argument(
+        "--phase",
+        action="append",
+        choices=[REGULAR_SEASON, POST_SEASON],
+        help="only crawl this part of the seasons, can be repeated",
+    )
+    parser.add_argument("--start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(CRAWL_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="request rate limits to crawl with, see game_crawlers/nba/throttle.py",
+    )
+    args = parser.parse_args()
+
     print("getting game ids")
 
     settings = get_project_settings()
     settings["COOKIES_ENABLED"] = False
-    settings["DOWNLOAD_DELAY"] = 3
     settings["LOG_LEVEL"] = "INFO"
     settings["ITEM_PIPELINES"] = {
         "game_crawlers.nba.pipelines.JsonWriterPipeline": 100,
+        "game_crawlers.nba.pipelines.DBWriterPipeline": 200,
+    }
+    # backfills write hundreds of games per season, buffer them so the database sees one
+    # bulk write per batch instead of a transaction per game.
+    settings["DB_BATCH_SIZE"] = 50
+    settings["DB_BATCH_SECONDS"] = 60
+    # full history runs load millions of player rows, stream each batch through COPY
+    settings["DB_WRITE_MODE"] = "copy"
+    # batches are written on worker threads so the crawl keeps going while postgres commits
+    settings["DB_WRITE_THREADS"] = 2
+    settings["DB_MAX_PENDING_WRITES"] = 4
+    # per host rate limits instead of one global delay, cache hits skip them
+    settings.update(profile_settings(args.profile))
+    settings.update(HTTPCACHE_SETTINGS)
+    settings["SKIP_KNOWN_GAMES"] = True
+    # scheduled and finished urls are kept in a frontier so a killed crawl resumes where it
+    # stopped, set JOBDIR to also keep scrapy's request queue across restarts
+    settings["FRONTIER_ENABLED"] = True
+    settings["FRONTIER_CHECK_STORED"] = True
+    settings["SPIDER_MIDDLEWARES"] = {
+        "game_crawlers.nba.frontier.CrawlFrontierMiddleware": 80,
+        "game_crawlers.nba.middlewares.KnownGameFilterMiddleware": 100,
     }
-    settings["AUTOTHROTTLE_ENABLED"] = True
-    settings["AUTOTHROTTLE_TARGET_CONCURRENCY"] = 1
 
-    url = BBRefScoreboard().get_all_scoreboard_urls()
+    # days without games and days whose games are all stored are skipped, the schedule
+    # index is filled in as scoreboards are parsed.
+    schedule = ScheduleIndex()
+    db = nba.nbaDB(USER, PASSWORD)
+    ingested = db.game_ids()
+    db.close()
+    # the urls are generated as the spider schedules them instead of up front
+    url = BBRefScoreboard(schedule, ingested).iter_scoreboard_urls(
+        seasons=args.season,
+        phases=args.phase or (REGULAR_SEASON, POST_SEASON),
+        start=args.start,
+        end=args.end,
+    )
     process = CrawlerProcess(settings)
-    process.crawl(BBRefSpider, urls=url)
+    process.crawl(BBRefSpider, urls=url, schedule=schedule)
     print("starting crawler")
     process.start()
     print("crawling completed")